@@ -1,9 +1,20 @@
-import os
+import time
+from collections import deque
 import streamlit as st
-from smart_article_tool import analyze_and_save_article
-from PyPDF2 import PdfReader
-from datetime import datetime
-from io import BytesIO
+from smart_article_tool import (CHUNK_SUMMARIZED, CLASSIFIED, DONE, DUPLICATE, ERROR, EXTRACTED, FETCHED, RANKED,
+                                get_article_store, iter_analyze_article, preload_models)
+from pdf_ingestion import file_hash, get_cached_pages, iter_pdf_pages
+from instrumentation import configure_logging, start_metrics_server
+
+# Articles shown per page of search results
+SEARCH_PAGE_SIZE = 20
+
+# Load and warm up the models once per server process so every session shares them
+@st.cache_resource(show_spinner="Loading models (first start only)...")
+def load_models():
+    configure_logging()
+    start_metrics_server()
+    return preload_models()
 
 # Streamlit UI for the app
 def main():
@@ -117,8 +128,12 @@ def main():
     # Sidebar
     st.sidebar.title("Navigation")
     st.sidebar.markdown("Select your input method and configure settings.")
-    option = st.sidebar.selectbox("Input Method", ["Enter URL", "Upload File"], help="Choose to input an article URL or upload a .txt/.pdf file.")
+    option = st.sidebar.selectbox("Input Method", ["Enter URL", "Upload File", "Search Past Articles"], help="Choose to input an article URL, upload a .txt/.pdf file, or search articles analyzed before.")
     theme = st.sidebar.radio("Theme", ["Dark", "Light"], index=0, help="Switch between dark and light themes (dark is default).")
+    model_timings = load_models()
+    with st.sidebar.expander("Model startup"):
+        for component, seconds in model_timings.items():
+            st.write(f"{component}: {seconds}s")
     
     # Apply light theme if selected
     if theme == "Light":
@@ -147,6 +162,10 @@ def main():
             </style>
             """, unsafe_allow_html=True)
 
+    if option == "Search Past Articles":
+        show_search()
+        return
+
     # Main content
     st.info("Sites like ResearchGate or Digiday may block scraping or require login. Special characters (e.g., en dash) are handled automatically. If a URL fails, upload the article as a .txt/.pdf file.")
 
@@ -159,58 +178,9 @@ def main():
             
             if st.button("Summarize Article"):
                 if article_url:
-                    progress_bar = st.progress(0)
-                    progress_bar.progress(10)  # Start processing
                     with st.spinner("Fetching and processing article..."):
-                        article_file_path, summary_file_path, extracted_text, summary, top_label, score, error = analyze_and_save_article(article_url, is_url=True)
-                    
-                    progress_bar.progress(50)  # Scraping complete
-                    if error:
-                        st.error(f"Failed to process the article: {error}")
-                        if "403 Forbidden" in error or "Login or paywall" in error:
-                            st.warning("This site (e.g., ResearchGate) may require login or restrict access. Try uploading the article content as a .txt or .pdf file.")
-                        elif "Unable to extract" in error:
-                            st.warning("Could not find the article content. The website may use JavaScript rendering or a unique structure (e.g., Digiday). Try uploading the article text or a different URL.")
-                        elif "codec can't encode" in error.lower():
-                            st.warning("The article contained special characters (e.g., en dash). This issue has been fixed; please try again.")
-                        progress_bar.empty()
-                        return
-                    
-                    progress_bar.progress(100)  # Processing complete
-                    if article_file_path and summary_file_path:
-                        st.success("Article processed successfully!")
-                        
-                        # Results Section
-                        st.markdown("<div class='section-header'>Results</div>", unsafe_allow_html=True)
-                        with st.container():
-                            st.markdown("<div class='section-container'>", unsafe_allow_html=True)
-                            st.subheader("Classification")
-                            st.write(f"Category: {top_label} ({score}%)")
-                            
-                            st.subheader("Extracted Text Preview")
-                            st.text_area("Extracted Text", extracted_text[:1000] + "..." if len(extracted_text) > 1000 else extracted_text, height=200, help="Preview of the scraped or uploaded article text.")
-                            
-                            st.subheader("Generated Summary")
-                            st.write(summary)
-                            
-                            # Download buttons
-                            st.markdown("<div class='download-buttons'>", unsafe_allow_html=True)
-                            with open(article_file_path, "rb") as article_file:
-                                article_bytes = article_file.read()
-                            with open(summary_file_path, "rb") as summary_file:
-                                summary_bytes = summary_file.read()
-                            
-                            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.download_button("Download Article PDF", article_bytes, file_name=f"article_{timestamp}.pdf", mime="application/pdf")
-                            with col2:
-                                st.download_button("Download Summary PDF", summary_bytes, file_name=f"summary_{timestamp}.pdf", mime="application/pdf")
-                            st.markdown("</div>", unsafe_allow_html=True)
-                            st.markdown("</div>", unsafe_allow_html=True)
-                    else:
-                        st.error("Failed to process the article. Please check the URL and try again.")
-                    progress_bar.empty()
+                        result, duplicate = run_analysis(article_url, is_url=True)
+                    store_result(result, option, show_preview=True, duplicate=duplicate)
                 else:
                     st.warning("Please enter a valid URL.")
 
@@ -218,108 +188,185 @@ def main():
             uploaded_file = st.file_uploader("Choose an article file:", type=["txt", "pdf"], help="Upload a .txt or .pdf file containing the article content.")
 
             if uploaded_file is not None:
+                pdf_hash = None
                 if uploaded_file.type == "text/plain":
                     file_content = uploaded_file.getvalue().decode("utf-8", errors="ignore")
                     st.subheader("File Content Preview")
                     st.text_area("File Content", file_content[:1000] + "..." if len(file_content) > 1000 else file_content, height=200)
-
-                    if st.button("Summarize Uploaded Article"):
-                        progress_bar = st.progress(0)
-                        progress_bar.progress(10)
-                        with st.spinner("Processing uploaded article..."):
-                            article_file_path, summary_file_path, extracted_text, summary, top_label, score, error = analyze_and_save_article(file_content, is_url=False)
-                        
-                        progress_bar.progress(100)
-                        if error:
-                            st.error(f"Failed to process the article: {error}")
-                            if "codec can't encode" in error.lower():
-                                st.warning("The file contained special characters (e.g., en dash). This issue has been fixed; please try again.")
-                            progress_bar.empty()
-                            return
-                        
-                        if article_file_path and summary_file_path:
-                            st.success("Article processed successfully!")
-                            
-                            # Results Section
-                            st.markdown("<div class='section-header'>Results</div>", unsafe_allow_html=True)
-                            with st.container():
-                                st.markdown("<div class='section-container'>", unsafe_allow_html=True)
-                                st.subheader("Classification")
-                                st.write(f"Category: {top_label} ({score}%)")
-                                
-                                st.subheader("Generated Summary")
-                                st.write(summary)
-                                
-                                st.markdown("<div class='download-buttons'>", unsafe_allow_html=True)
-                                with open(article_file_path, "rb") as article_file:
-                                    article_bytes = article_file.read()
-                                with open(summary_file_path, "rb") as summary_file:
-                                    summary_bytes = summary_file.read()
-                                
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    st.download_button("Download Article PDF", article_bytes, file_name="uploaded_article.pdf", mime="application/pdf")
-                                with col2:
-                                    st.download_button("Download Summary PDF", summary_bytes, file_name="uploaded_article_summary.pdf", mime="application/pdf")
-                                st.markdown("</div>", unsafe_allow_html=True)
-                                st.markdown("</div>", unsafe_allow_html=True)
-                        else:
-                            st.error("Failed to process the article. Please try again.")
-                        progress_bar.empty()
-
                 elif uploaded_file.type == "application/pdf":
-                    reader = PdfReader(uploaded_file)
-                    full_text = ""
-                    for page in reader.pages:
-                        full_text += page.extract_text() or ""
-                    
+                    pdf_bytes = uploaded_file.getvalue()
+                    pdf_hash = file_hash(pdf_bytes)
                     st.subheader("Extracted Text from PDF")
-                    st.text_area("Extracted Text", full_text[:1000] + "..." if len(full_text) > 1000 else full_text, height=200)
+                    cached_pages = get_cached_pages(pdf_hash)
+                    if cached_pages is not None:
+                        file_content = "\n".join(cached_pages)
+                        st.text_area("Extracted Text", file_content[:1000] + "..." if len(file_content) > 1000 else file_content, height=200)
+                    else:
+                        # Pages are extracted once, while the article is being summarized
+                        pdf_preview = st.empty()
+                        pdf_preview.info(f"{len(pdf_bytes) / 1048576:.1f} MB PDF. Text is extracted when you summarize it.")
+                        file_content = stream_pdf_pages(pdf_bytes, pdf_preview)
+                else:
+                    file_content = None
 
-                    if st.button("Summarize Uploaded Article"):
-                        progress_bar = st.progress(0)
-                        progress_bar.progress(10)
-                        with st.spinner("Processing uploaded article..."):
-                            article_file_path, summary_file_path, extracted_text, summary, top_label, score, error = analyze_and_save_article(full_text, is_url=False)
-                        
-                        progress_bar.progress(100)
-                        if error:
-                            st.error(f"Failed to process the article: {error}")
-                            if "codec can't encode" in error.lower():
-                                st.warning("The file contained special characters (e.g., en dash). This issue has been fixed; please try again.")
-                            progress_bar.empty()
-                            return
-                        
-                        if article_file_path and summary_file_path:
-                            st.success("Article processed successfully!")
-                            
-                            # Results Section
-                            st.markdown("<div class='section-header'>Results</div>", unsafe_allow_html=True)
-                            with st.container():
-                                st.markdown("<div class='section-container'>", unsafe_allow_html=True)
-                                st.subheader("Classification")
-                                st.write(f"Category: {top_label} ({score}%)")
-                                
-                                st.subheader("Generated Summary")
-                                st.write(summary)
-                                
-                                st.markdown("<div class='download-buttons'>", unsafe_allow_html=True)
-                                with open(article_file_path, "rb") as article_file:
-                                    article_bytes = article_file.read()
-                                with open(summary_file_path, "rb") as summary_file:
-                                    summary_bytes = summary_file.read()
-                                
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    st.download_button("Download Article PDF", article_bytes, file_name="uploaded_article.pdf", mime="application/pdf")
-                                with col2:
-                                    st.download_button("Download Summary PDF", summary_bytes, file_name="uploaded_article_summary.pdf", mime="application/pdf")
-                                st.markdown("</div>", unsafe_allow_html=True)
-                                st.markdown("</div>", unsafe_allow_html=True)
-                        else:
-                            st.error("Failed to process the article. Please try again.")
-                        progress_bar.empty()
+                if file_content is not None and st.button("Summarize Uploaded Article"):
+                    with st.spinner("Processing uploaded article..."):
+                        result, duplicate = run_analysis(file_content, is_url=False, pdf_hash=pdf_hash)
+                    store_result(result, option, show_preview=False, duplicate=duplicate)
         st.markdown("</div>", unsafe_allow_html=True)
 
+    # Results stay in the session so downloads and other reruns do not lose them
+    result = st.session_state.get("result")
+    if result and result["option"] == option:
+        if result["error"]:
+            show_error(result["error"])
+        else:
+            show_results(result)
+
+# Function to run an analysis, showing each step's results as soon as they are available
+def run_analysis(content, is_url, pdf_hash=None):
+    progress_bar = st.progress(0)
+    status = st.empty()
+    live_label = st.empty()
+    live_summary = st.empty()
+    # Only the latest chunk summaries are shown, however long the article
+    partial_summaries = deque(maxlen=5)
+    result = (None, None, None, None, None, None, "Analysis ended without a result.")
+    duplicate = None
+    # PDFs are only rendered when the user asks for the downloads
+    for event in iter_analyze_article(content, is_url=is_url, save_pdfs=False, file_hash=pdf_hash):
+        if event.progress is not None:
+            progress_bar.progress(int(event.progress * 100))
+        if event.kind == FETCHED:
+            status.caption(f"Downloaded {event.data['size'] // 1024} KB, extracting article...")
+        elif event.kind == EXTRACTED:
+            status.caption(f"Extracted {len(event.data['text'])} characters, classifying...")
+        elif event.kind == DUPLICATE:
+            duplicate = event.data
+            status.caption("Found a near-duplicate of an earlier article, reusing its results...")
+        elif event.kind == CLASSIFIED:
+            live_label.write(f"Category: {event.data['label']} ({event.data['score']}%)")
+            status.caption("Summarizing...")
+        elif event.kind == CHUNK_SUMMARIZED:
+            partial_summaries.append(event.data["summary"])
+            total = event.data["total"]
+            status.caption(f"Summarized part {event.data['index']}" + (f" of {total}" if total else "") + "...")
+            live_summary.write("Draft summary: ..." + " ".join(partial_summaries))
+        elif event.kind == RANKED:
+            live_summary.write(event.data["summary"])
+            status.caption("Preparing downloads...")
+        elif event.kind == DONE:
+            result = event.data["result"]
+        elif event.kind == ERROR:
+            result = (None, None, None, None, None, None, event.data["error"])
+    # The final results are shown from the session state below
+    for placeholder in (progress_bar, status, live_label, live_summary):
+        placeholder.empty()
+    return result, duplicate
+
+# Function to stream PDF pages into the analysis, previewing the first ones as they arrive
+def stream_pdf_pages(pdf_bytes, preview):
+    shown = ""
+    for page in iter_pdf_pages(pdf_bytes):
+        if len(shown) < 1000:
+            shown += page + "\n"
+            preview.text(shown[:1000] + "..." if len(shown) > 1000 else shown)
+        yield page
+
+# Function to keep the latest analysis in the session state
+def store_result(result, option, show_preview, duplicate=None):
+    article_pdf, summary_pdf, extracted_text, summary, top_label, score, error = result
+    st.session_state["result"] = {
+        "option": option,
+        "article_pdf": article_pdf,
+        "summary_pdf": summary_pdf,
+        "text": extracted_text,
+        "summary": summary,
+        "label": top_label,
+        "score": score,
+        "error": error,
+        "show_preview": show_preview,
+        "pdfs_requested": False,
+        "duplicate": duplicate,
+    }
+
+# Function to show a processing error with a hint for common causes
+def show_error(error):
+    st.error(f"Failed to process the article: {error}")
+    if "403 Forbidden" in error or "Login or paywall" in error:
+        st.warning("This site (e.g., ResearchGate) may require login or restrict access. Try uploading the article content as a .txt or .pdf file.")
+    elif "Unable to extract" in error:
+        st.warning("Could not find the article content. The website may use JavaScript rendering or a unique structure (e.g., Digiday). Try uploading the article text or a different URL.")
+    elif "codec can't encode" in error.lower():
+        st.warning("The article contained special characters (e.g., en dash). This issue has been fixed; please try again.")
+    elif "server is busy" in error.lower():
+        st.warning("The server is processing many articles right now. Please try again in a moment.")
+
+# Function to show classification, summary and PDF downloads
+def show_results(result):
+    st.success("Article processed successfully!")
+    if result["duplicate"]:
+        st.info(f"This article is a near-duplicate of '{result['duplicate']['title']}' "
+                f"({round(result['duplicate']['similarity'] * 100)}% similar), so its results were reused.")
+    st.markdown("<div class='section-header'>Results</div>", unsafe_allow_html=True)
+    with st.container():
+        st.markdown("<div class='section-container'>", unsafe_allow_html=True)
+        st.subheader("Classification")
+        st.write(f"Category: {result['label']} ({result['score']}%)")
+
+        if result["show_preview"]:
+            extracted_text = result["text"]
+            st.subheader("Extracted Text Preview")
+            st.text_area("Extracted Text", extracted_text[:1000] + "..." if len(extracted_text) > 1000 else extracted_text, height=200, help="Preview of the scraped or uploaded article text.")
+
+        st.subheader("Generated Summary")
+        st.write(result["summary"])
+
+        # PDFs are only rendered once the user asks for them
+        st.markdown("<div class='download-buttons'>", unsafe_allow_html=True)
+        if not result["pdfs_requested"]:
+            if st.button("Prepare PDF Downloads"):
+                result["pdfs_requested"] = True
+        if result["pdfs_requested"]:
+            article_pdf, summary_pdf = result["article_pdf"], result["summary_pdf"]
+            with st.spinner("Rendering PDFs..."):
+                article_bytes, summary_bytes = article_pdf.bytes(), summary_pdf.bytes()
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button("Download Article PDF", article_bytes, file_name=article_pdf.filename, mime="application/pdf")
+            with col2:
+                st.download_button("Download Summary PDF", summary_bytes, file_name=summary_pdf.filename, mime="application/pdf")
+        st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+# Function to search or browse previously analyzed articles
+def show_search():
+    st.markdown("<div class='section-header'>Past Articles</div>", unsafe_allow_html=True)
+    store = get_article_store()
+    if store is None:
+        st.warning("The article store is disabled (SMART_ARTICLE_STORE=0).")
+        return
+    counts = store.label_counts()
+    query = st.text_input("Search titles, text and summaries:", help="Leave empty to browse the most recent articles.")
+    col1, col2 = st.columns(2)
+    with col1:
+        label = st.selectbox("Category", ["All"] + [f"{name} ({count})" for name, count in counts.items()])
+    with col2:
+        page = st.number_input("Page", min_value=1, value=1, step=1)
+    label = None if label == "All" else label.rsplit(" (", 1)[0]
+
+    start = time.perf_counter()
+    rows = store.search(query, label, SEARCH_PAGE_SIZE, (page - 1) * SEARCH_PAGE_SIZE)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    st.caption(f"{len(rows)} articles on this page of {sum(counts.values())} stored ({elapsed_ms:.1f} ms)")
+    for row in rows:
+        with st.expander(f"{row['title'] or 'Untitled'} — {row['label']} ({row['score']}%)"):
+            if row["snippet"]:
+                st.markdown(f"...{row['snippet']}...")
+            st.write(row["summary"])
+            if row["source_url"]:
+                st.write(f"Source: {row['source_url']}")
+            st.caption(f"Analyzed {time.strftime('%Y-%m-%d %H:%M', time.localtime(row['created']))}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,199 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_STORE_PATH = os.environ.get("SMART_ARTICLE_STORE_PATH", "articles.sqlite3")
+# Records buffered before they are written in one transaction, and the longest a record waits
+BATCH_SIZE = 32
+FLUSH_INTERVAL = 2.0
+
+_COLUMNS = ("created", "source_url", "text_hash", "title", "label", "score", "label_scores", "summary", "text",
+            "timings", "article_pdf", "summary_pdf", "duplicate_of")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Bumped when the FTS index layout changes; older indexes are rebuilt on open
+FTS_VERSION = 2
+SNIPPET_WORDS = 16
+
+# Function to turn free text into a safe FTS5 query: every word must match, the last one as a prefix
+def fts_query(text):
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"' for token in tokens[:-1]) + (" " if len(tokens) > 1 else "") + f'"{tokens[-1]}"*'
+
+# Function to cut the words around the first query match out of `text`, with matches in **bold**
+def snippet(text, query, size=SNIPPET_WORDS):
+    prefixes = tuple(token.lower() for token in _TOKEN_RE.findall(query))
+    words = (text or "").split()
+    matches = [i for i, word in enumerate(words) if word.lower().lstrip("\"'([").startswith(prefixes)]
+    if not prefixes or not matches:
+        return None
+    start = max(0, min(matches[0] - size // 4, len(words) - size))
+    window = words[start:start + size]
+    return " ".join(f"**{word}**" if start + i in matches else word for i, word in enumerate(window))
+
+# Function to build the snippet from whichever column matched: summary, then text, then title
+def article_snippet(article, query, size=SNIPPET_WORDS):
+    for column in ("summary", "text", "title"):
+        cut = snippet(article.get(column), query, size)
+        if cut is not None:
+            return cut
+    # Stemmed matches ("studies" for "study") have no prefix match; show the start of the summary
+    words = (article.get("summary") or article.get("text") or "").split()
+    return " ".join(words[:size]) or None
+
+class ArticleStore:
+    """SQLite store of analyzed articles with FTS5 indexes over title, text and summary"""
+
+    def __init__(self, path=DEFAULT_STORE_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL lets the app read while a batch is being written
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        rebuild = self._conn.execute("PRAGMA user_version").fetchone()[0] < FTS_VERSION
+        if rebuild:
+            self._conn.executescript(
+                "DROP TRIGGER IF EXISTS articles_fts_insert; DROP TRIGGER IF EXISTS articles_fts_delete;"
+                " DROP TABLE IF EXISTS articles_fts; DROP TABLE IF EXISTS articles_match_fts;"
+            )
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            " id INTEGER PRIMARY KEY, created REAL NOT NULL, source_url TEXT, text_hash TEXT NOT NULL,"
+            " title TEXT, label TEXT, score REAL, label_scores TEXT, summary TEXT, text TEXT,"
+            " timings TEXT, article_pdf TEXT, summary_pdf TEXT, duplicate_of TEXT);"
+            "CREATE INDEX IF NOT EXISTS articles_created ON articles(created);"
+            "CREATE INDEX IF NOT EXISTS articles_label ON articles(label, created);"
+            "CREATE INDEX IF NOT EXISTS articles_text_hash ON articles(text_hash);"
+            # External-content FTS tables: the text is stored once, in articles. articles_match_fts covers
+            # every column but keeps no word positions (detail=none), so it is small and only finds matches;
+            # articles_fts keeps positions for title and summary only, so BM25 stays cheap to compute
+            "CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5("
+            " title, summary, content='articles', content_rowid='id', tokenize='porter unicode61');"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS articles_match_fts USING fts5("
+            " title, text, summary, content='articles', content_rowid='id', tokenize='porter unicode61',"
+            " detail=none);"
+            "CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN"
+            " INSERT INTO articles_fts(rowid, title, summary) VALUES (new.id, new.title, new.summary);"
+            " INSERT INTO articles_match_fts(rowid, title, text, summary)"
+            " VALUES (new.id, new.title, new.text, new.summary);"
+            " END;"
+            "CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN"
+            " INSERT INTO articles_fts(articles_fts, rowid, title, summary)"
+            " VALUES ('delete', old.id, old.title, old.summary);"
+            " INSERT INTO articles_match_fts(articles_match_fts, rowid, title, text, summary)"
+            " VALUES ('delete', old.id, old.title, old.text, old.summary);"
+            " END;"
+        )
+        if rebuild:
+            self._conn.execute("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')")
+            self._conn.execute("INSERT INTO articles_match_fts(articles_match_fts) VALUES ('rebuild')")
+            self._conn.execute(f"PRAGMA user_version = {FTS_VERSION}")
+        self._conn.commit()
+
+    def add(self, record):
+        """Queue an article record (a dict with any of the article columns) for the next batch"""
+        row = dict(record)
+        row.setdefault("created", time.time())
+        for key in ("label_scores", "timings"):
+            if row.get(key) is not None and not isinstance(row[key], str):
+                row[key] = json.dumps(row[key])
+        with self._lock:
+            self._pending.append(tuple(row.get(column) for column in _COLUMNS))
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+            elif self._timer is None and self.flush_interval:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO articles ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", rows
+            )
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def search(self, query, label=None, limit=20, offset=0):
+        """Rank articles matching `query` by BM25 over title and summary, then text-only matches newest first"""
+        match = fts_query(query)
+        if match is None:
+            return self.browse(label, limit, offset)
+        self.flush()
+        # Text-only matches get rank 0, after every (negative) BM25 score; article rows and snippets
+        # are only read for the requested page
+        matches = ("SELECT rowid AS id, bm25(articles_fts, 5.0, 2.0) AS rank FROM articles_fts WHERE articles_fts MATCH :match"
+                   " UNION ALL SELECT rowid, 0.0 FROM articles_match_fts WHERE articles_match_fts MATCH :match"
+                   " AND rowid NOT IN (SELECT rowid FROM articles_fts WHERE articles_fts MATCH :match)")
+        page = f"SELECT m.id, m.rank FROM ({matches}) m"
+        params = {"match": match, "label": label, "limit": limit, "offset": offset}
+        if label:
+            page += " JOIN articles a ON a.id = m.id WHERE a.label = :label"
+        page += " ORDER BY m.rank, m.id DESC LIMIT :limit OFFSET :offset"
+        sql = ("SELECT a.id, a.created, a.source_url, a.title, a.label, a.score, a.summary, a.text"
+               f" FROM ({page}) p JOIN articles a ON a.id = p.id ORDER BY p.rank, p.id DESC")
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        results = []
+        for row in rows:
+            article = dict(row)
+            article["snippet"] = article_snippet(article, query)
+            del article["text"]
+            results.append(article)
+        return results
+
+    def browse(self, label=None, limit=20, offset=0):
+        """Most recent articles first"""
+        self.flush()
+        sql = "SELECT id, created, source_url, title, label, score, summary, NULL AS snippet FROM articles"
+        params = []
+        if label:
+            sql += " WHERE label = ?"
+            params.append(label)
+        sql += " ORDER BY created DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit, offset]).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, article_id):
+        self.flush()
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM articles WHERE id = ?", (article_id,)).fetchone()
+        if row is None:
+            return None
+        article = dict(row)
+        for key in ("label_scores", "timings"):
+            if article[key]:
+                article[key] = json.loads(article[key])
+        return article
+
+    def label_counts(self):
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute("SELECT label, COUNT(*) FROM articles GROUP BY label ORDER BY COUNT(*) DESC").fetchall()
+        return {label: count for label, count in rows}
@@ -0,0 +1,162 @@
+"""Compare inference backends for accuracy drift, latency and memory.
+
+Each backend runs in its own process so its peak memory is measured in isolation.
+The first backend is the reference the others are compared against.
+
+    python benchmarks/backend_parity.py --backends torch torch-int8 onnx --summaries
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from model_backends import BACKENDS  # noqa: E402
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures", "txt")
+LABELS = ["Design", "Technology", "Business", "Marketing", "AI"]
+CLASSIFIER_MODEL = "facebook/bart-large-mnli"
+SUMMARIZER_MODEL = "google/pegasus-xsum"
+
+# Function to read the fixture corpus as (name, text) pairs
+def load_corpus(folder=FIXTURE_DIR):
+    corpus = []
+    for name in sorted(os.listdir(folder)):
+        if name.endswith(".txt"):
+            with open(os.path.join(folder, name), encoding="utf-8") as fixture:
+                corpus.append((name, fixture.read()))
+    return corpus
+
+# Function to run the corpus through one backend (executed in a child process)
+def run_backend(backend, corpus, summaries, results):
+    try:
+        results.put(measure_backend(backend, corpus, summaries))
+    except Exception as e:
+        results.put({"backend": backend, "error": f"{type(e).__name__}: {e}"})
+
+def measure_backend(backend, corpus, summaries):
+    import resource
+    from model_backends import load_pipeline
+
+    start = time.perf_counter()
+    classifier = load_pipeline("zero-shot-classification", CLASSIFIER_MODEL, backend)
+    summarizer = load_pipeline("summarization", SUMMARIZER_MODEL, backend) if summaries else None
+    report = {"backend": backend, "load_s": time.perf_counter() - start, "articles": {},
+              "classify_ms": [], "summarize_ms": []}
+
+    for name, text in corpus:
+        start = time.perf_counter()
+        output = classifier(text, candidate_labels=LABELS)
+        report["classify_ms"].append((time.perf_counter() - start) * 1000)
+        article = {"scores": dict(zip(output["labels"], output["scores"])), "label": output["labels"][0]}
+        if summarizer is not None:
+            start = time.perf_counter()
+            article["summary"] = summarizer(text, max_length=64, min_length=10, do_sample=False, truncation=True)[0]["summary_text"]
+            report["summarize_ms"].append((time.perf_counter() - start) * 1000)
+        report["articles"][name] = article
+
+    # ru_maxrss is reported in kilobytes on Linux
+    report["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return report
+
+# Function to wait for a child's report without hanging if it dies (e.g. killed for running out of memory)
+def wait_for_report(process, results, poll_seconds=1.0):
+    while True:
+        try:
+            return results.get(timeout=poll_seconds)
+        except queue.Empty:
+            if not process.is_alive():
+                # A report sent just before exiting may still be in the pipe
+                try:
+                    return results.get(timeout=poll_seconds)
+                except queue.Empty:
+                    return None
+
+# Function to compute unigram F1 between two summaries
+def token_f1(reference, candidate):
+    ref, cand = reference.lower().split(), candidate.lower().split()
+    common = sum(min(ref.count(word), cand.count(word)) for word in set(cand))
+    if not common:
+        return 0.0
+    precision, recall = common / len(cand), common / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+# Function to compare a backend's results with the reference backend
+def compare(reference, candidate):
+    deltas, agree, f1 = [], 0, []
+    for name, ref in reference["articles"].items():
+        cand = candidate["articles"][name]
+        agree += ref["label"] == cand["label"]
+        deltas.extend(abs(ref["scores"][label] - cand["scores"][label]) for label in LABELS)
+        if "summary" in ref:
+            f1.append(token_f1(ref["summary"], cand["summary"]))
+    count = len(reference["articles"])
+    return {
+        "label_agreement": agree / count,
+        "mean_score_delta": statistics.mean(deltas),
+        "max_score_delta": max(deltas),
+        "summary_token_f1": statistics.mean(f1) if f1 else None,
+        "classify_speedup": statistics.mean(reference["classify_ms"]) / statistics.mean(candidate["classify_ms"]),
+        "summarize_speedup": (statistics.mean(reference["summarize_ms"]) / statistics.mean(candidate["summarize_ms"])
+                              if f1 else None),
+        "rss_delta_mb": candidate["peak_rss_mb"] - reference["peak_rss_mb"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="Folder of .txt articles")
+    parser.add_argument("--summaries", action="store_true", help="Also compare summarization")
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.fixtures)
+    context = multiprocessing.get_context("spawn")
+    reports, failures = [], []
+    for backend in args.backends:
+        print(f"▶️ Running {backend} on {len(corpus)} articles...")
+        results = context.Queue()
+        process = context.Process(target=run_backend, args=(backend, corpus, args.summaries, results))
+        process.start()
+        report = wait_for_report(process, results)
+        process.join()
+        if report is None:
+            report = {"backend": backend, "error": f"process exited with code {process.exitcode} without a report"}
+        if "error" in report:
+            print(f"❌ {backend} failed: {report['error']}")
+            failures.append(report)
+        else:
+            reports.append(report)
+
+    if not reports:
+        sys.exit("No backend finished.")
+    # The first backend that finished is the reference
+    reference = reports[0]
+    print(f"\n{'backend':<12} {'load s':>7} {'classify ms':>12} {'summarize ms':>13} {'peak MB':>8} "
+          f"{'agree':>6} {'mean Δ':>7} {'max Δ':>7} {'sum F1':>7}")
+    for report in reports:
+        diff = compare(reference, report)
+        summarize_ms = f"{statistics.mean(report['summarize_ms']):.0f}" if report["summarize_ms"] else "-"
+        summary_f1 = f"{diff['summary_token_f1']:.2f}" if diff["summary_token_f1"] is not None else "-"
+        print(f"{report['backend']:<12} {report['load_s']:>7.1f} {statistics.mean(report['classify_ms']):>12.0f} "
+              f"{summarize_ms:>13} {report['peak_rss_mb']:>8.0f} {diff['label_agreement']:>6.0%} "
+              f"{diff['mean_score_delta']:>7.3f} {diff['max_score_delta']:>7.3f} {summary_f1:>7}")
+        report["comparison"] = diff
+
+    for failure in failures:
+        print(f"{failure['backend']:<12} failed: {failure['error']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(reports + failures, output, indent=2)
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark the article store: batched inserts and full-text search latency.
+
+Fills a temporary store with synthetic articles, then times searches, filtered
+searches and browsing at that size.
+
+    python benchmarks/bench_article_store.py --articles 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from article_store import ArticleStore  # noqa: E402
+
+WORDS = ("research hospital model policy data results patients system study public software design market "
+         "election climate energy vaccine league season budget inflation startup court river satellite").split()
+# Rarer words follow a Zipf-like distribution, as in real text
+VOCABULARY = WORDS + [f"term{i}" for i in range(20000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+LABELS = ["Technology", "Health", "Politics", "Sports", "Business", "Science"]
+
+# Function to build a synthetic article record
+def synthetic_article(rng, index):
+    text = " ".join(rng.choices(VOCABULARY, WEIGHTS, k=rng.randint(300, 1500)))
+    return {"source_url": f"https://example.com/article-{index}", "text_hash": f"{index:064x}",
+            "title": " ".join(rng.choice(WORDS) for _ in range(6)).title(), "label": rng.choice(LABELS),
+            "score": round(rng.uniform(40, 99), 2), "summary": text[:400], "text": text,
+            "timings": {"classify": 0.5, "summarize": 2.0}}
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def timed_queries(func, queries):
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query)
+        times.append((time.perf_counter() - start) * 1000)
+    return percentile(times, 0.5), percentile(times, 0.95)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, nargs="+", default=[10000, 100000], help="Store sizes to test")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"{'articles':>9} {'insert/s':>10} {'MB':>7} {'search p50':>11} {'p95':>7} "
+          f"{'filtered p50':>13} {'p95':>7} {'browse p50':>11} {'p95':>7}")
+    for count in args.articles:
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "articles.sqlite3")
+            store = ArticleStore(path, flush_interval=0)
+            # Articles are generated in slices, outside the timed inserts, to keep memory flat
+            elapsed = 0.0
+            for first in range(0, count, 1000):
+                articles = [synthetic_article(rng, index) for index in range(first, min(count, first + 1000))]
+                start = time.perf_counter()
+                for article in articles:
+                    store.add(article)
+                store.flush()
+                elapsed += time.perf_counter() - start
+            insert_rate = count / elapsed
+            size_mb = sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder)) / 1048576
+
+            queries = [" ".join(rng.choices(VOCABULARY, WEIGHTS, k=rng.randint(1, 3))) for _ in range(args.queries)]
+            search = timed_queries(lambda query: store.search(query), queries)
+            filtered = timed_queries(lambda query: store.search(query, label=rng.choice(LABELS)), queries)
+            browse = timed_queries(lambda query: store.browse(rng.choice(LABELS), offset=rng.randint(0, 100)), queries)
+            store.close()
+        print(f"{count:>9} {insert_rate:>10.0f} {size_mb:>7.1f} {search[0]:>9.2f}ms {search[1]:>5.2f}ms "
+              f"{filtered[0]:>11.2f}ms {filtered[1]:>5.2f}ms {browse[0]:>9.2f}ms {browse[1]:>5.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark HTML article extraction on the fixture pages.
+
+Compares the single-pass density extractor in html_extraction.py with the previous
+BeautifulSoup selector chain: latency per page and token-level F1 against the
+expected article text in fixtures/html/expected.json. Paywall fixtures count as
+correct when the extractor reports a paywall.
+
+    python benchmarks/bench_html_extraction.py --repeat 50 --scale 1 20
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from html_extraction import extract_html, resolve_backend  # noqa: E402
+from smart_article_tool import PAYWALL_MESSAGE, extract_article_with_soup  # noqa: E402
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures", "html")
+TOKEN_RE = re.compile(r"\w+")
+
+# Function to load (name, html, expected text, paywall) for every fixture
+def load_fixtures(directory=FIXTURE_DIR):
+    with open(os.path.join(directory, "expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    fixtures = []
+    for name, entry in sorted(expected.items()):
+        with open(os.path.join(directory, name + ".html"), encoding="utf-8") as f:
+            fixtures.append((name, f.read(), entry["expected"], entry["paywall"]))
+    return fixtures
+
+# Function to compute bag-of-tokens F1 between extracted and expected text
+def token_f1(extracted, expected):
+    found, gold = Counter(TOKEN_RE.findall(extracted.lower())), Counter(TOKEN_RE.findall(expected.lower()))
+    overlap = sum((found & gold).values())
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / sum(found.values()), overlap / sum(gold.values())
+    return 2 * precision * recall / (precision + recall)
+
+def density(html):
+    result = extract_html(html)
+    return result.text or "", result.error == "paywall"
+
+def legacy(html):
+    _, text, error = extract_article_with_soup(html)
+    return text or "", error == PAYWALL_MESSAGE
+
+# Function to repeat the article body so pages look like long real-world documents
+def scale_page(html, factor):
+    if factor <= 1:
+        return html
+    return re.sub(r"(<p>.*?</p>)", lambda m: m.group(1) * factor, html, flags=re.S | re.I)
+
+def timed(func, html, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(html)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def score(func, html, expected, paywall):
+    text, detected = func(html)
+    if paywall:
+        return 1.0 if detected else 0.0
+    return 0.0 if detected else token_f1(text, expected)
+
+# Function to print the F1 table and the latency table
+def report(fixtures, args):
+    print(f"Density extractor parser backend: {resolve_backend()}\n")
+    print(f"{'fixture':<22} {'legacy F1':>10} {'density F1':>11}")
+    totals = Counter()
+    for name, html, expected, paywall in fixtures:
+        legacy_score = score(legacy, html, expected, paywall)
+        density_score = score(density, html, expected, paywall)
+        totals["legacy"] += legacy_score
+        totals["density"] += density_score
+        print(f"{name:<22} {legacy_score:>10.2f} {density_score:>11.2f}")
+    print(f"{'mean':<22} {totals['legacy'] / len(fixtures):>10.2f} {totals['density'] / len(fixtures):>11.2f}\n")
+
+    print(f"{'scale':>6} {'KB/page':>8} {'legacy ms':>10} {'density ms':>11} {'speedup':>8}")
+    for factor in args.scale:
+        pages = [scale_page(html, factor) for _, html, _, _ in fixtures]
+        legacy_ms = 1000 * sum(timed(legacy, page, args.repeat) for page in pages) / len(pages)
+        density_ms = 1000 * sum(timed(density, page, args.repeat) for page in pages) / len(pages)
+        kilobytes = sum(len(page) for page in pages) / len(pages) / 1000
+        print(f"{factor:>6} {kilobytes:>8.1f} {legacy_ms:>10.2f} {density_ms:>11.2f} {legacy_ms / density_ms:>7.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 20],
+                        help="Repeat each paragraph this many times for the latency runs")
+    args = parser.parse_args()
+
+    # Both extractors log a warning for every paywalled page; keep the report readable
+    tool_logger = logging.getLogger("smart_article_tool")
+    level = tool_logger.level
+    tool_logger.setLevel(logging.ERROR)
+    try:
+        report(load_fixtures(), args)
+    finally:
+        tool_logger.setLevel(level)
+
+if __name__ == "__main__":
+    main()
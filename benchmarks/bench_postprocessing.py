@@ -0,0 +1,84 @@
+"""Micro-benchmark of summary post-processing (rank_sentences + filter_relevant_sentences).
+
+Compares the previous implementation, which re-parsed every sentence with the full
+spaCy pipeline, against the current single-parse version.
+
+    python benchmarks/bench_postprocessing.py --chunks 40 --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from heapq import nlargest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import smart_article_tool  # noqa: E402
+
+KEYWORDS = ['artificial intelligence', 'bioethics', 'society', 'medical', 'ethics', 'technology']
+WORDS = ("the model study patients hospital data research artificial intelligence ethics society "
+         "medical technology policy researchers said new system results public health care").split()
+
+# Function to build a summary like the ones produced from `chunks` chunk summaries
+def synthetic_summary(chunks, seed=13):
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(chunks):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(12, 30))]
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+# Previous implementation, kept here as the baseline
+def legacy_rank_sentences(nlp, text, n=5):
+    doc = nlp(text)
+    sentences = [sent.text.strip() for sent in doc.sents]
+    sentence_scores = {}
+    for sent in sentences:
+        doc_sent = nlp(sent)
+        score = sum(token.rank for token in doc_sent if token.rank) / (len(doc_sent) + 1)
+        sentence_scores[sent] = score
+    return nlargest(n, sentence_scores, key=sentence_scores.get)
+
+def legacy_filter_relevant_sentences(nlp, sentences, keywords):
+    relevant_sentences = []
+    for sent in sentences:
+        doc = nlp(sent.lower())
+        if any(keyword in [token.text for token in doc] for keyword in keywords):
+            relevant_sentences.append(sent)
+    return relevant_sentences if relevant_sentences else sentences[:min(5, len(sentences))]
+
+def current_postprocess(text):
+    ranked = smart_article_tool.rank_sentences(text, n=5)
+    return smart_article_tool.filter_relevant_sentences(ranked, KEYWORDS)
+
+def legacy_postprocess(text):
+    nlp = smart_article_tool.get_nlp()
+    ranked = legacy_rank_sentences(nlp, text, n=5)
+    return legacy_filter_relevant_sentences(nlp, ranked, KEYWORDS)
+
+# Function to time a post-processing function, returning the best per-article time in ms
+def best_time(func, text, repeat):
+    func(text)  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[5, 20, 80], help="Chunk summaries per article")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'chunks':>8} {'legacy ms':>12} {'current ms':>12} {'speedup':>9}")
+    for chunks in args.chunks:
+        text = synthetic_summary(chunks)
+        legacy = best_time(legacy_postprocess, text, args.repeat)
+        current = best_time(current_postprocess, text, args.repeat)
+        print(f"{chunks:>8} {legacy:>12.1f} {current:>12.1f} {legacy / current:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark text cleaning on multi-MB scraped-page-like inputs.
+
+Compares the previous single-regex clean_text_for_pdf (applied twice, as the
+article path used to do) with the trie-compiled cleaner in text_cleaning.py, and
+checks that both produce identical output.
+
+    python benchmarks/bench_text_cleaning.py --sizes 1 4 16
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_cleaning import PDF_PASSES, clean_text  # noqa: E402
+
+PARAGRAPH_WORDS = ("research hospital model policy data results patients system study public café naïve "
+                   "rôle coöperate – — “quoted” software design market").split()
+BOILERPLATE_LINES = ["Advertisement", "Share This Article", "Related Posts", "Subscribe Now for updates",
+                     "Privacy Policy | Terms of Use", "Copyright 2024 All rights reserved", "Read more"]
+
+# Previous implementation, kept here as the baseline
+def legacy_clean_text_for_pdf(text):
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    text = re.sub(
+        r'(Advertisement|Sponsored|Subscribe Now|Sign Up|Log In|Follow Us|Share This|Related Posts|'
+        r'Footer|Nav|Menu|Sidebar|Comment|Social Media|Home|About|Contact|Privacy Policy|'
+        r'Terms of Use|Terms and Conditions|Login to view|BBC News|Published by|Journal of|'
+        r'Copyright|All rights reserved|Posted on|Updated on|Share on|Read more|'
+        r'Newsletter|Membership|Cookies|Accept|Decline|View Full Text).*?(?=\n|$)',
+        '', text, flags=re.IGNORECASE
+    )
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+# Function to build roughly `megabytes` MB of page text with paragraphs and boilerplate lines
+def synthetic_page(megabytes, seed=7):
+    rng = random.Random(seed)
+    lines, size = [], 0
+    while size < megabytes * 1_000_000:
+        if rng.random() < 0.15:
+            line = rng.choice(BOILERPLATE_LINES)
+        else:
+            line = " ".join(rng.choice(PARAGRAPH_WORDS) for _ in range(rng.randint(20, 120))) + "."
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+def legacy_pipeline(text):
+    # The article text was cleaned in analyze_and_save_article and again in save_text_as_pdf
+    return legacy_clean_text_for_pdf(legacy_clean_text_for_pdf(text))
+
+def current_pipeline(text):
+    return clean_text(clean_text(text, PDF_PASSES), PDF_PASSES)
+
+def timed(func, text, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 16], help="Input sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'MB':>6} {'legacy s':>10} {'current s':>10} {'MB/s':>8} {'speedup':>8} {'same output':>12}")
+    for megabytes in args.sizes:
+        text = synthetic_page(megabytes)
+        legacy_time, legacy_result = timed(legacy_pipeline, text, args.repeat)
+        current_time, current_result = timed(current_pipeline, text, args.repeat)
+        print(f"{megabytes:>6.1f} {legacy_time:>10.3f} {current_time:>10.3f} {megabytes / current_time:>8.1f} "
+              f"{legacy_time / current_time:>7.1f}x {str(legacy_result == current_result):>12}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""End-to-end benchmark of the analysis pipeline on the fixture corpus.
+
+Runs every HTML, TXT and PDF fixture through iter_analyze_article with caches,
+near-duplicate reuse and the article store turned off. HTML pages are served by a
+local HTTP server, so the fetch stage runs without network access. Reports p50/p95
+latency per stage, articles per second and peak RSS, and compares them with a
+baseline saved by an earlier run.
+
+    python benchmarks/run_benchmark.py --mode stub --save-baseline baseline_stub.json
+    python benchmarks/run_benchmark.py --mode stub --baseline baseline_stub.json
+    python benchmarks/run_benchmark.py --mode real --repeat 1
+
+`stub` replaces the summarizer, classifier and tokenizer with fast deterministic
+stand-ins (and spaCy with a blank English pipeline) to measure everything but the
+models; `real` loads the configured local models.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Every run starts cold: no result, HTTP or PDF text caches, no duplicate reuse, nothing stored
+os.environ.update({
+    "SMART_ARTICLE_CACHE": "0",
+    "SMART_ARTICLE_DEDUP": "0",
+    "SMART_ARTICLE_STORE": "0",
+    "SMART_ARTICLE_HTTP_CACHE": "",
+    "SMART_ARTICLE_PDF_CACHE": "",
+})
+
+import pdf_ingestion  # noqa: E402
+import pdf_rendering  # noqa: E402
+import smart_article_tool  # noqa: E402
+from smart_article_tool import DONE, ERROR, iter_analyze_article  # noqa: E402
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+KINDS = ("html", "txt", "pdf")
+# Relative slowdown of a metric, compared with the baseline, that counts as a regression
+DEFAULT_TOLERANCE = 0.15
+# Latency changes smaller than this are timer noise, whatever their relative size
+MIN_DELTA_MS = 1.0
+# Copies of the TXT fixtures in the long PDF fixture
+LONG_PDF_COPIES = 4
+
+
+class StubTokenizer:
+    """Whitespace tokenizer with the interface chunk_text and the reducer use"""
+    model_max_length = 512
+
+    def __call__(self, text, add_special_tokens=False, **kwargs):
+        return {"input_ids": text.split()}
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 1
+
+    def decode(self, ids, **kwargs):
+        return " ".join(ids)
+
+
+class StubSummarizer:
+    """Returns the first `max_length` words of every input"""
+    tokenizer = StubTokenizer()
+
+    def __call__(self, inputs, max_length=60, min_length=0, **kwargs):
+        texts = [inputs] if isinstance(inputs, str) else inputs
+        return [{"summary_text": " ".join(text.split()[:max_length]).rstrip(".") + "."} for text in texts]
+
+# Function to score labels by keyword counts, shaped like classify_text's result
+def stub_classify(classifier, text, labels, reducer="mean", **kwargs):
+    lowered = text.lower()
+    counts = [lowered.count(label.lower()) + 1 for label in labels]
+    total = sum(counts)
+    ranked = sorted(zip(labels, (count / total for count in counts)), key=lambda item: item[1], reverse=True)
+    return {"labels": [label for label, _ in ranked], "scores": [score for _, score in ranked], "windows": 1}
+
+# Function to swap the models for deterministic stand-ins
+def install_stubs():
+    import spacy
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    smart_article_tool.INFERENCE_SERVER = ""
+    smart_article_tool.nlp = nlp
+    smart_article_tool.summarizer = StubSummarizer()
+    # Never loaded: stub_classify ignores the pipeline it is given
+    smart_article_tool.classifier = "stub"
+    smart_article_tool.classify_text = stub_classify
+
+# Function to render the PDF fixtures from the TXT fixtures with the app's own PDF layout
+def build_pdf_fixtures(directory=os.path.join(FIXTURE_DIR, "pdf")):
+    os.makedirs(directory, exist_ok=True)
+    texts = {}
+    for name in sorted(os.listdir(os.path.join(FIXTURE_DIR, "txt"))):
+        with open(os.path.join(FIXTURE_DIR, "txt", name), encoding="utf-8") as f:
+            texts[os.path.splitext(name)[0]] = f.read()
+    for name in list(texts)[:2]:
+        pdf_rendering.write_atomic(os.path.join(directory, name + ".pdf"),
+                                   pdf_rendering.render_pdf(name.replace("_", " ").title(), texts[name]))
+    report = "\n\n".join(list(texts.values()) * LONG_PDF_COPIES)
+    pdf_rendering.write_atomic(os.path.join(directory, "long_report.pdf"), pdf_rendering.render_pdf("Quarterly Report", report))
+
+# Function to list (kind, name, path) for every fixture of the selected kinds
+def load_corpus(kinds):
+    corpus = []
+    for kind in kinds:
+        directory = os.path.join(FIXTURE_DIR, kind)
+        for name in sorted(os.listdir(directory)):
+            if name.endswith("." + kind):
+                corpus.append((kind, name, os.path.join(directory, name)))
+    return corpus
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+# Function to serve the HTML fixtures locally; returns the server and its base URL
+def start_fixture_server():
+    handler = partial(_QuietHandler, directory=os.path.join(FIXTURE_DIR, "html"))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+# Function to analyze one fixture; returns (seconds, stage timings, error)
+def run_article(kind, name, path, base_url):
+    # Rendered PDFs are not reused between runs
+    pdf_rendering.pdf_cache = pdf_rendering.PdfCache(pdf_rendering.pdf_cache.max_bytes)
+    start = time.perf_counter()
+    if kind == "html":
+        events = iter_analyze_article(f"{base_url}/{name}", is_url=True)
+    elif kind == "txt":
+        with open(path, encoding="utf-8") as f:
+            events = iter_analyze_article(f.read(), is_url=False)
+    else:
+        with open(path, "rb") as f:
+            events = iter_analyze_article(pdf_ingestion.iter_pdf_pages(f.read()), is_url=False)
+    timings, error = {}, None
+    for event in events:
+        if event.kind == DONE:
+            timings = event.data["timings"]
+        elif event.kind == ERROR:
+            error = event.data["error"]
+    # Background PDF writes count towards the run
+    pdf_rendering.wait_for_pending()
+    return time.perf_counter() - start, timings, error
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+# Function to read this process's peak resident set size in MB
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+# Function to run the corpus `repeat` times and summarize the measurements
+def run_benchmark(mode, kinds, repeat, warmup):
+    corpus = load_corpus(kinds)
+    # Extracted PDF text is not kept in memory either
+    pdf_ingestion.MEMORY_CACHE_FILES = 0
+    server, base_url = start_fixture_server()
+    load_seconds = 0.0
+    if mode == "stub":
+        install_stubs()
+    else:
+        start = time.perf_counter()
+        smart_article_tool.preload_models()
+        load_seconds = time.perf_counter() - start
+
+    stages, errors, totals = {}, {}, []
+    workdir = tempfile.mkdtemp(prefix="smart-article-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        for _ in range(warmup):
+            for item in corpus:
+                run_article(*item, base_url)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for kind, name, path in corpus:
+                seconds, timings, error = run_article(kind, name, path, base_url)
+                if error:
+                    errors[name] = error
+                    continue
+                totals.append(seconds)
+                for stage, value in timings.items():
+                    stages.setdefault(stage, []).append(value)
+        elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+
+    stages["total"] = totals
+    return {
+        "mode": mode,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "kinds": list(kinds),
+        "fixtures": len(corpus),
+        "articles": len(totals),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "articles_per_second": round(len(totals) / elapsed, 3) if elapsed else 0.0,
+        "model_load_seconds": round(load_seconds, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "stages": {stage: {"p50_ms": round(percentile(values, 0.5) * 1000, 2),
+                           "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+                           "count": len(values)}
+                   for stage, values in sorted(stages.items()) if values},
+    }
+
+# Function to list (metric, baseline, current, change, regressed) rows; lower is better except throughput
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE, min_delta_ms=MIN_DELTA_MS):
+    rows = []
+
+    def add(metric, old, new, higher_is_better=False, min_delta=0.0):
+        if old is None or new is None or not old:
+            return
+        change = (new - old) / old
+        regressed = change < -tolerance if higher_is_better else (change > tolerance and new - old >= min_delta)
+        rows.append((metric, old, new, change, regressed))
+
+    add("articles_per_second", baseline.get("articles_per_second"), report["articles_per_second"], higher_is_better=True)
+    add("peak_rss_mb", baseline.get("peak_rss_mb"), report["peak_rss_mb"])
+    for stage, values in report["stages"].items():
+        old = baseline.get("stages", {}).get(stage, {})
+        for key in ("p50_ms", "p95_ms"):
+            add(f"{stage}.{key}", old.get(key), values[key], min_delta=min_delta_ms)
+    return rows
+
+def print_report(report):
+    print(f"Mode: {report['mode']}  fixtures: {report['fixtures']}  articles: {report['articles']}  "
+          f"errors: {len(report['errors'])}")
+    print(f"{'stage':<22} {'p50 ms':>10} {'p95 ms':>10} {'count':>6}")
+    for stage, values in report["stages"].items():
+        print(f"{stage:<22} {values['p50_ms']:>10.2f} {values['p95_ms']:>10.2f} {values['count']:>6}")
+    print(f"Articles/sec: {report['articles_per_second']}  peak RSS: {report['peak_rss_mb']} MB"
+          + (f"  model load: {report['model_load_seconds']}s" if report["model_load_seconds"] else ""))
+    for name, error in sorted(report["errors"].items()):
+        print(f"  {name}: {error[:80]}")
+
+def print_comparison(rows):
+    print(f"\n{'metric':<28} {'baseline':>10} {'current':>10} {'change':>8}")
+    for metric, old, new, change, regressed in rows:
+        print(f"{metric:<28} {old:>10.2f} {new:>10.2f} {change * 100:>+7.1f}%" + ("  REGRESSION" if regressed else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("stub", "real"), default="stub")
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS), help="Fixture types to run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed passes over the corpus")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed passes before measuring")
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--baseline", help="Compare with a report saved earlier")
+    parser.add_argument("--save-baseline", help="Save this report as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=MIN_DELTA_MS, help="Smallest latency change reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression")
+    parser.add_argument("--build-pdfs", action="store_true", help="Re-render the PDF fixtures and exit")
+    args = parser.parse_args()
+
+    if args.build_pdfs:
+        build_pdf_fixtures()
+        return
+
+    report = run_benchmark(args.mode, args.kinds, args.repeat, args.warmup)
+    print_report(report)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("mode") != report["mode"] or baseline.get("kinds") != report["kinds"]:
+            print(f"\n⚠️ Baseline was recorded in '{baseline.get('mode')}' mode on {baseline.get('kinds')} fixtures")
+        rows = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        print_comparison(rows)
+        if args.fail_on_regression and any(row[4] for row in rows):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
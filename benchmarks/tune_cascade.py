@@ -0,0 +1,73 @@
+"""Tune the classification cascade threshold on a labeled fixture set.
+
+For every candidate threshold, reports how many articles would escalate to the
+zero-shot model and how accurate the first stage is on the articles it keeps.
+With --with-nli the zero-shot model is run too, giving the accuracy of the whole cascade.
+
+    python benchmarks/tune_cascade.py --thresholds 0.5 0.6 0.7 0.8 0.9 --with-nli
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cascade_classifier import DEFAULT_MODEL_PATH, SEED_KEYWORDS, CascadeClassifier, tune_threshold  # noqa: E402
+
+LABELED_SET = os.path.join(ROOT, "benchmarks", "fixtures", "labeled_articles.jsonl")
+
+# Function to read (text, label) pairs; "file" entries are relative to the labeled set
+def load_examples(path):
+    examples = []
+    with open(path, encoding="utf-8") as labeled:
+        for line in labeled:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            text = entry.get("text")
+            if text is None:
+                with open(os.path.join(os.path.dirname(path), entry["file"]), encoding="utf-8") as fixture:
+                    text = fixture.read()
+            examples.append((text, entry["label"]))
+    return examples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labeled", default=LABELED_SET, help="JSONL with 'label' and 'text' or 'file'")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="First-stage model (seed vocabulary if missing)")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95])
+    parser.add_argument("--with-nli", action="store_true", help="Run the zero-shot model on every example")
+    args = parser.parse_args()
+
+    examples = load_examples(args.labeled)
+    labels = list(SEED_KEYWORDS)
+    cascade = CascadeClassifier(labels, model_path=args.model)
+
+    start = time.perf_counter()
+    for text, _ in examples:
+        cascade.first_stage.predict(text)
+    first_stage_ms = 1000 * (time.perf_counter() - start) / len(examples)
+
+    nli_labels, nli_ms = None, None
+    if args.with_nli:
+        from smart_article_tool import CLASSIFY_REDUCER, classify_text, get_classifier
+        classifier = get_classifier()
+        start = time.perf_counter()
+        nli_labels = [classify_text(classifier, text, labels, reducer=CLASSIFY_REDUCER)["labels"][0] for text, _ in examples]
+        nli_ms = 1000 * (time.perf_counter() - start) / len(examples)
+        accuracy = sum(label == gold for label, (_, gold) in zip(nli_labels, examples)) / len(examples)
+        print(f"Zero-shot model alone: {accuracy:.0%} accurate, {nli_ms:.0f} ms per article")
+    print(f"First stage: {first_stage_ms:.2f} ms per article on {len(examples)} examples\n")
+
+    print(f"{'threshold':>10} {'escalated':>10} {'stage-1 acc':>12} {'cascade acc':>12} {'est. ms':>8}")
+    for row in tune_threshold(cascade.first_stage, examples, args.thresholds, nli_labels):
+        stage_accuracy = f"{row['first_stage_accuracy']:.0%}" if row["first_stage_accuracy"] is not None else "-"
+        cascade_accuracy = f"{row['cascade_accuracy']:.0%}" if row["cascade_accuracy"] is not None else "-"
+        estimate = f"{first_stage_ms + row['escalation_rate'] * nli_ms:.0f}" if nli_ms is not None else "-"
+        print(f"{row['threshold']:>10.2f} {row['escalation_rate']:>10.0%} {stage_accuracy:>12} {cascade_accuracy:>12} {estimate:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import json
+import sys
+from urllib.parse import urlparse
+
+from instrumentation import configure_logging, start_metrics_server
+from pdf_rendering import wait_for_pending
+from smart_article_tool import extract_article, fetch_url, get_article_store, process_article
+
+# Concurrency limits for the fetch stage
+FETCH_CONCURRENCY = 16
+PER_HOST_CONCURRENCY = 2
+# Extracted articles waiting for the model stage; fetching pauses when this is full
+QUEUE_SIZE = 8
+
+_DONE = object()
+
+# Function to fetch and extract one URL into a queue item
+async def fetch_article(url, host_limits, per_host):
+    host = urlparse(url).netloc.lower()
+    if host not in host_limits:
+        host_limits[host] = asyncio.Semaphore(per_host)
+    try:
+        async with host_limits[host]:
+            html = await asyncio.to_thread(fetch_url, url)
+        title, text, error = await asyncio.to_thread(extract_article, html)
+    except Exception as e:
+        title, text, error = None, None, str(e)
+    return {"url": url, "title": title, "text": text, "error": error}
+
+# Function to run the fetch stage, feeding extracted articles into the queue
+async def produce(urls, queue, concurrency, per_host, model_workers):
+    fetch_slots = asyncio.Semaphore(concurrency)
+    host_limits = {}
+    pending = set()
+
+    async def run(url):
+        try:
+            await queue.put(await fetch_article(url, host_limits, per_host))
+        finally:
+            # The slot is held until the item is queued, so a slow model stage throttles fetching
+            fetch_slots.release()
+
+    for url in urls:
+        url = url.strip()
+        if not url or url.startswith('#'):
+            continue
+        await fetch_slots.acquire()
+        task = asyncio.create_task(run(url))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*list(pending))
+    for _ in range(model_workers):
+        await queue.put(_DONE)
+
+# Function to run the model stage, writing one JSON line per finished article
+async def consume(queue, output, save_pdfs, counts):
+    while True:
+        item = await queue.get()
+        if item is _DONE:
+            return
+        result = {"url": item["url"], "title": item["title"], "label": None, "score": None,
+                  "summary": None, "article_pdf": None, "summary_pdf": None, "error": item["error"]}
+        if not item["error"]:
+            article_pdf, summary_pdf, _, summary, label, score, error = await asyncio.to_thread(
+                process_article, item["title"], item["text"], True, save_pdfs, item["url"]
+            )
+            result.update(label=label, score=score, summary=summary, error=error)
+            if save_pdfs and not error:
+                # Paths the PDFs are being written to in the background
+                result.update(article_pdf=article_pdf.path, summary_pdf=summary_pdf.path)
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        counts["failed" if result["error"] else "processed"] += 1
+
+# Function to analyze many URLs, overlapping downloads with model inference
+async def ingest_urls(urls, output, concurrency=FETCH_CONCURRENCY, per_host=PER_HOST_CONCURRENCY,
+                      queue_size=QUEUE_SIZE, model_workers=1, save_pdfs=False):
+    """Fetch `urls` concurrently and write results to `output` as JSON lines in completion order"""
+    queue = asyncio.Queue(maxsize=queue_size)
+    counts = {"processed": 0, "failed": 0}
+    await asyncio.gather(
+        produce(urls, queue, concurrency, per_host, model_workers),
+        *(consume(queue, output, save_pdfs, counts) for _ in range(model_workers))
+    )
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify and summarize a list of article URLs.")
+    parser.add_argument("urls", help="File with one URL per line, or '-' for stdin")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL output file, appended to (default: results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=FETCH_CONCURRENCY, help="Maximum downloads in flight")
+    parser.add_argument("--per-host", type=int, default=PER_HOST_CONCURRENCY, help="Maximum downloads in flight per host")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Extracted articles buffered for the models")
+    parser.add_argument("--model-workers", type=int, default=1, help="Articles analyzed in parallel")
+    parser.add_argument("--save-pdfs", action="store_true", help="Also write article and summary PDFs")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+    args = parser.parse_args(argv)
+    configure_logging()
+    start_metrics_server(args.metrics_port)
+
+    url_file = sys.stdin if args.urls == '-' else open(args.urls, encoding='utf-8')
+    output = open(args.output, 'a', encoding='utf-8')
+    try:
+        counts = asyncio.run(ingest_urls(url_file, output, args.concurrency, args.per_host,
+                                         args.queue_size, args.model_workers, args.save_pdfs))
+        wait_for_pending()
+    finally:
+        store = get_article_store()
+        if store:
+            store.flush()
+        if url_file is not sys.stdin:
+            url_file.close()
+        output.close()
+    print(f"✅ Processed {counts['processed']} articles, {counts['failed']} failed", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
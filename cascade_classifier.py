@@ -0,0 +1,262 @@
+import json
+import logging
+import math
+import os
+import re
+import sys
+import threading
+import time
+from instrumentation import CASCADE_DECISIONS, stage
+
+# First-stage confidence needed to skip the zero-shot model
+DEFAULT_THRESHOLD = float(os.environ.get("SMART_ARTICLE_CASCADE_THRESHOLD", "0.9"))
+DEFAULT_MODEL_PATH = os.environ.get("SMART_ARTICLE_CASCADE_MODEL", os.path.join(".cache", "cascade_model.json"))
+# Sharpness of the softmax over centroid similarities
+TEMPERATURE = 12.0
+# Learned examples between saves of the first-stage model
+SAVE_EVERY = 20
+# Words the self-learned first stage keeps (the most widespread ones), and classifications between stats log lines
+MAX_VOCABULARY = int(os.environ.get("SMART_ARTICLE_CASCADE_VOCABULARY", "20000"))
+STATS_EVERY = 100
+
+logger = logging.getLogger(__name__)
+
+# Seed vocabulary so the first stage is usable before it has seen any results
+SEED_KEYWORDS = {
+    "Design": "design designer designers interface typography layout visual colour color palette usability "
+              "accessibility user experience prototype branding illustration graphic font aesthetic",
+    "Technology": "technology software hardware chip chips semiconductor device devices cloud computing "
+                  "engineers smartphone network data centre processor internet digital startup app",
+    "Business": "business company companies revenue profit shares investors market earnings quarter "
+                "sales growth debt chief executive financial forecast acquisition funding",
+    "Marketing": "marketing brand brands campaign campaigns advertising audience customers social media "
+                 "influencer creators engagement promotion seo content conversion",
+    "AI": "artificial intelligence machine learning model models neural network trained training "
+          "algorithm algorithms language deep learning chatbot prediction automation data",
+}
+
+STOPWORDS = set("""a about above after again against all also am an and any are as at be because been before
+being below between both but by can could did do does doing down during each few for from further had has
+have having he her here hers him his how i if in into is it its itself just more most my no nor not now of
+off on once only or other our out over own same she should so some such than that the their them then
+there these they this those through to too under until up very was we were what when where which while who
+whom why will with would you your said says one two new year years""".split())
+
+_WORD_RE = re.compile(r"[a-z][a-z\-]{2,}")
+
+# Function to split text into lowercase content words
+def tokenize(text):
+    return [word for word in _WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+
+# Function to get normalized term frequencies of a text
+def term_frequencies(text):
+    counts = {}
+    for word in tokenize(text):
+        counts[word] = counts.get(word, 0) + 1
+    total = sum(counts.values()) or 1
+    return {word: count / total for word, count in counts.items()}
+
+
+class CentroidClassifier:
+    """TF-IDF centroid classifier used as the cheap first stage"""
+
+    def __init__(self, labels, max_vocabulary=MAX_VOCABULARY):
+        self.labels = list(labels)
+        self.max_vocabulary = max_vocabulary
+        self.term_sums = {label: {} for label in self.labels}
+        self.doc_freq = {}
+        self.doc_count = 0
+        self._centroids = None
+
+    def learn(self, text, label):
+        if label not in self.term_sums:
+            return
+        sums = self.term_sums[label]
+        for word, freq in term_frequencies(text).items():
+            sums[word] = sums.get(word, 0.0) + freq
+            self.doc_freq[word] = self.doc_freq.get(word, 0) + 1
+        self.doc_count += 1
+        self._centroids = None
+        # Pruning in steps keeps its cost off most calls
+        if self.max_vocabulary and len(self.doc_freq) > self.max_vocabulary * 1.25:
+            self.prune(self.max_vocabulary)
+
+    # Function to forget all but the `max_words` words seen in the most documents (seed words are kept)
+    def prune(self, max_words):
+        keep = set(sorted(self.doc_freq, key=self.doc_freq.get, reverse=True)[:max_words])
+        keep.update(word for words in SEED_KEYWORDS.values() for word in tokenize(words))
+        self.doc_freq = {word: count for word, count in self.doc_freq.items() if word in keep}
+        self.term_sums = {label: {word: value for word, value in sums.items() if word in keep}
+                          for label, sums in self.term_sums.items()}
+        self._centroids = None
+
+    def seed(self, keywords=SEED_KEYWORDS):
+        for label, words in keywords.items():
+            self.learn(words, label)
+
+    def _idf(self, word):
+        return math.log((1 + self.doc_count) / (1 + self.doc_freq.get(word, 0))) + 1
+
+    def _vector(self, weights):
+        vector = {word: weight * self._idf(word) for word, weight in weights.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        return {word: value / norm for word, value in vector.items()}
+
+    def predict(self, text):
+        """Return {'labels', 'scores'} sorted by probability"""
+        if self._centroids is None:
+            self._centroids = {label: self._vector(sums) for label, sums in self.term_sums.items()}
+        vector = self._vector(term_frequencies(text))
+        similarities = [
+            sum(value * self._centroids[label].get(word, 0.0) for word, value in vector.items())
+            for label in self.labels
+        ]
+        top = max(similarities)
+        exps = [math.exp(TEMPERATURE * (similarity - top)) for similarity in similarities]
+        total = sum(exps)
+        ranked = sorted(zip(self.labels, (value / total for value in exps)), key=lambda item: item[1], reverse=True)
+        return {"labels": [label for label, _ in ranked], "scores": [score for _, score in ranked]}
+
+    def to_dict(self):
+        return {"labels": self.labels, "term_sums": self.term_sums, "doc_freq": self.doc_freq, "doc_count": self.doc_count}
+
+    @classmethod
+    def from_dict(cls, data):
+        model = cls(data["labels"])
+        model.term_sums = data["term_sums"]
+        model.doc_freq = data["doc_freq"]
+        model.doc_count = data["doc_count"]
+        return model
+
+
+class CascadeClassifier:
+    """Two-stage classifier: a centroid model first, the zero-shot model only when it is unsure"""
+
+    def __init__(self, labels, threshold=DEFAULT_THRESHOLD, model_path=DEFAULT_MODEL_PATH):
+        self.labels = list(labels)
+        self.threshold = threshold
+        self.model_path = model_path
+        self.first_stage = self._load_model()
+        self.counts = {"total": 0, "escalated": 0}
+        self.latency = {"first_stage": 0.0, "nli": 0.0}
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+    def _load_model(self):
+        if self.model_path and os.path.exists(self.model_path):
+            with open(self.model_path, encoding='utf-8') as model_file:
+                model = CentroidClassifier.from_dict(json.load(model_file))
+            if model.labels == self.labels:
+                return model
+        model = CentroidClassifier(self.labels)
+        model.seed()
+        return model
+
+    def save(self):
+        if not self.model_path:
+            return
+        folder = os.path.dirname(self.model_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        with self._lock:
+            data = json.dumps(self.first_stage.to_dict())
+            self._unsaved = 0
+        tmp_path = f"{self.model_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as model_file:
+            model_file.write(data)
+        os.replace(tmp_path, self.model_path)
+
+    # Function to record a trusted result so the first stage keeps improving
+    def learn(self, text, label):
+        with self._lock:
+            self.first_stage.learn(text, label)
+            self._unsaved += 1
+            should_save = self._unsaved >= SAVE_EVERY
+        if should_save:
+            self.save()
+
+    def classify(self, text, escalate, timings=None):
+        """Classify `text`, calling `escalate()` for the zero-shot result when the first stage is unsure"""
+        start = time.perf_counter()
+        with stage("classify_first_stage", timings), self._lock:
+            result = self.first_stage.predict(text)
+            self.counts["total"] += 1
+            self.latency["first_stage"] += time.perf_counter() - start
+            log_stats = self.counts["total"] % STATS_EVERY == 0
+        if result["scores"][0] >= self.threshold:
+            result["stage"] = "first_stage"
+        else:
+            start = time.perf_counter()
+            with stage("classify_nli", timings):
+                result = dict(escalate())
+            with self._lock:
+                self.latency["nli"] += time.perf_counter() - start
+                self.counts["escalated"] += 1
+            result["stage"] = "nli"
+            self.learn(text, result["labels"][0])
+        CASCADE_DECISIONS.inc(stage=result["stage"])
+        if log_stats:
+            logger.info("📊 Cascade stats", extra=self.stats())
+        return result
+
+    def stats(self):
+        with self._lock:
+            total, escalated = self.counts["total"], self.counts["escalated"]
+            latency = dict(self.latency)
+            vocabulary = len(self.first_stage.doc_freq)
+        return {
+            "total": total,
+            "escalated": escalated,
+            "escalation_rate": escalated / total if total else 0.0,
+            "first_stage_ms": 1000 * latency["first_stage"] / total if total else 0.0,
+            "nli_ms": 1000 * latency["nli"] / escalated if escalated else 0.0,
+            "vocabulary": vocabulary,
+        }
+
+# Function to evaluate candidate thresholds on labeled examples
+def tune_threshold(model, examples, thresholds, nli_labels=None):
+    """Report escalation rate and accuracy for each threshold.
+
+    `examples` is a list of (text, gold_label). `nli_labels` optionally holds the
+    zero-shot model's label for each example; without it, escalated examples are
+    left out of the cascade accuracy and only the first stage is scored.
+    """
+    predictions = [model.predict(text) for text, _ in examples]
+    report = []
+    for threshold in thresholds:
+        accepted = correct_accepted = correct_total = 0
+        for i, ((_, gold), prediction) in enumerate(zip(examples, predictions)):
+            if prediction["scores"][0] >= threshold:
+                accepted += 1
+                correct_accepted += prediction["labels"][0] == gold
+                correct_total += prediction["labels"][0] == gold
+            elif nli_labels is not None:
+                correct_total += nli_labels[i] == gold
+        escalated = len(examples) - accepted
+        report.append({
+            "threshold": threshold,
+            "escalation_rate": escalated / len(examples),
+            "first_stage_accuracy": correct_accepted / accepted if accepted else None,
+            "cascade_accuracy": correct_total / len(examples) if nli_labels is not None else None,
+        })
+    return report
+
+# Function to train the first stage from JSON lines with "text" and "label" fields
+def train_from_jsonl(path, labels, model_path=DEFAULT_MODEL_PATH):
+    cascade = CascadeClassifier(labels, model_path=model_path)
+    learned = 0
+    with open(path, encoding='utf-8') as examples:
+        for line in examples:
+            if line.strip():
+                example = json.loads(line)
+                cascade.first_stage.learn(example["text"], example["label"])
+                learned += 1
+    cascade.save()
+    return learned
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "train":
+        count = train_from_jsonl(sys.argv[2], list(SEED_KEYWORDS))
+        print(f"✅ Trained first stage on {count} examples")
+    else:
+        print("Usage: python cascade_classifier.py train examples.jsonl")
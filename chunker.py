@@ -0,0 +1,124 @@
+import re
+
+# Fallback input window when the tokenizer does not report one (google/pegasus-xsum uses 512)
+DEFAULT_MAX_TOKENS = 512
+# Characters handed to spaCy per call when splitting long texts into sentences
+SENTENCE_BLOCK_CHARS = 100000
+# Pipeline components that sentence splitting does not need
+UNUSED_COMPONENTS = ["ner", "lemmatizer", "attribute_ruler", "textcat"]
+
+_FALLBACK_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Function to get the usable number of input tokens per chunk
+def max_input_tokens(tokenizer, max_tokens=None):
+    limit = max_tokens or getattr(tokenizer, "model_max_length", None) or DEFAULT_MAX_TOKENS
+    # Tokenizers without a configured limit report a huge sentinel value
+    if limit > 100000:
+        limit = DEFAULT_MAX_TOKENS
+    return limit - tokenizer.num_special_tokens_to_add(pair=False)
+
+# Function to cut long text into blocks spaCy can parse, preferring sentence ends
+def _text_blocks(text, size=SENTENCE_BLOCK_CHARS):
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = text.rfind('. ', start, end)
+            if cut > start:
+                end = cut + 1
+        yield text[start:end]
+        start = end
+
+# Function to split text into sentences
+def split_sentences(texts, nlp=None):
+    if isinstance(texts, str):
+        texts = [texts]
+    blocks = (block for text in texts for block in _text_blocks(text))
+    if nlp is None:
+        for block in blocks:
+            for sent in _FALLBACK_SENTENCE_RE.split(block):
+                if sent.strip():
+                    yield sent.strip()
+        return
+    for doc in nlp.pipe(blocks, disable=UNUSED_COMPONENTS):
+        for sent in doc.sents:
+            if sent.text.strip():
+                yield sent.text.strip()
+
+# Function to pack sentences into chunks close to the model's token window
+def iter_chunks(texts, tokenizer, nlp=None, max_tokens=None, overlap_tokens=0, stats=None):
+    """Yield chunks of whole sentences that fit the tokenizer's input window.
+
+    `texts` may be a string or an iterable of text blocks (e.g. pages), which are
+    consumed lazily. When `overlap_tokens` is set, each chunk starts with the last
+    tokens of the previous one. Token statistics are collected into `stats` if given.
+    """
+    budget = max_input_tokens(tokenizer, max_tokens)
+    overlap_tokens = max(0, min(overlap_tokens, budget // 2))
+    if stats is not None:
+        stats.update(new_chunk_stats(budget, overlap_tokens))
+
+    current_text, current_ids, overlap_ids = [], [], []
+
+    def flush():
+        ids = overlap_ids + current_ids
+        prefix = tokenizer.decode(overlap_ids, skip_special_tokens=True).strip() if overlap_ids else ""
+        chunk = " ".join(([prefix] if prefix else []) + current_text)
+        if stats is not None:
+            record_chunk(stats, len(ids))
+        return chunk, ids[-overlap_tokens:] if overlap_tokens else []
+
+    for sentence in split_sentences(texts, nlp):
+        ids = tokenizer(sentence, add_special_tokens=False)["input_ids"]
+        if stats is not None:
+            stats["sentence_count"] += 1
+        room = budget - len(overlap_ids)
+        if current_ids and len(current_ids) + len(ids) > room:
+            chunk, overlap_ids = flush()
+            current_text, current_ids = [], []
+            yield chunk
+            room = budget - len(overlap_ids)
+        if len(ids) > room:
+            # A single sentence longer than the window is split on token boundaries
+            while len(ids) > room:
+                current_text = [tokenizer.decode(ids[:room], skip_special_tokens=True).strip()]
+                current_ids = ids[:room]
+                chunk, overlap_ids = flush()
+                yield chunk
+                ids = ids[room:]
+                room = budget - len(overlap_ids)
+            current_text, current_ids = [], []
+            sentence = tokenizer.decode(ids, skip_special_tokens=True).strip()
+        current_text.append(sentence)
+        current_ids.extend(ids)
+    if current_ids:
+        chunk, _ = flush()
+        yield chunk
+
+# Function to chunk a whole text at once
+def chunk_text(text, tokenizer, nlp=None, max_tokens=None, overlap_tokens=0):
+    """Return (chunks, stats) for `text`; see iter_chunks for the packing rules"""
+    stats = {}
+    chunks = list(iter_chunks(text, tokenizer, nlp, max_tokens, overlap_tokens, stats))
+    return chunks, stats
+
+# Function to create an empty token statistics record
+def new_chunk_stats(max_tokens, overlap_tokens=0):
+    return {
+        "chunk_count": 0,
+        "sentence_count": 0,
+        "total_tokens": 0,
+        "min_tokens": 0,
+        "max_tokens": 0,
+        "mean_tokens": 0.0,
+        "max_input_tokens": max_tokens,
+        "overlap_tokens": overlap_tokens,
+    }
+
+# Function to add one chunk's token count to the statistics
+def record_chunk(stats, token_count):
+    stats["chunk_count"] += 1
+    stats["total_tokens"] += token_count
+    stats["min_tokens"] = token_count if stats["chunk_count"] == 1 else min(stats["min_tokens"], token_count)
+    stats["max_tokens"] = max(stats["max_tokens"], token_count)
+    stats["mean_tokens"] = round(stats["total_tokens"] / stats["chunk_count"], 1)
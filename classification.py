@@ -0,0 +1,118 @@
+import math
+import os
+from instrumentation import MODEL_BATCH_SIZE, STAGE_TOKENS
+
+# Hypothesis used by the zero-shot pipeline for each candidate label
+HYPOTHESIS_TEMPLATE = "This example is {}."
+# How window scores are combined into one score per label
+REDUCERS = ("mean", "max", "length")
+# (window, label) pairs per forward pass
+CLASSIFY_BATCH_SIZE = int(os.environ.get("SMART_ARTICLE_CLASSIFY_BATCH_SIZE", "16"))
+# Longer texts are classified on this many evenly spaced windows
+MAX_WINDOWS = int(os.environ.get("SMART_ARTICLE_CLASSIFY_MAX_WINDOWS", "16"))
+
+# Tokenized hypotheses, keyed by tokenizer, template and label set
+_hypothesis_cache = {}
+
+# Function to get the tokenized hypothesis of every label, tokenizing each label set only once
+def hypothesis_ids(tokenizer, labels, template=HYPOTHESIS_TEMPLATE):
+    key = (id(tokenizer), template, tuple(labels))
+    if key not in _hypothesis_cache:
+        hypotheses = [template.format(label) for label in labels]
+        _hypothesis_cache[key] = tokenizer(hypotheses, add_special_tokens=False)["input_ids"]
+    return _hypothesis_cache[key]
+
+# Function to find the logit index of the entailment class of an NLI model
+def entailment_index(model):
+    for label, index in model.config.label2id.items():
+        if label.lower().startswith("entail"):
+            return index
+    return -1
+
+# Function to split a text into token windows, keeping at most `max_windows` evenly spaced ones
+def token_windows(tokenizer, text, window_tokens, max_windows=MAX_WINDOWS):
+    ids = tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"]
+    windows = [ids[i:i + window_tokens] for i in range(0, len(ids), window_tokens)] or [[]]
+    if max_windows and len(windows) > max_windows:
+        step = len(windows) / max_windows
+        windows = [windows[int(i * step)] for i in range(max_windows)]
+    return windows
+
+# Function to combine per-window label probabilities into one distribution
+def reduce_scores(window_scores, window_lengths, reducer="mean"):
+    if reducer not in REDUCERS:
+        raise ValueError(f"Unknown reducer '{reducer}', expected one of: {', '.join(REDUCERS)}")
+    label_count = len(window_scores[0])
+    if reducer == "max":
+        combined = [max(scores[i] for scores in window_scores) for i in range(label_count)]
+    else:
+        weights = window_lengths if reducer == "length" else [1] * len(window_scores)
+        combined = [sum(w * scores[i] for w, scores in zip(weights, window_scores)) for i in range(label_count)]
+    total = sum(combined) or 1.0
+    return [score / total for score in combined]
+
+# Function to softmax a list of logits
+def _softmax(logits):
+    top = max(logits)
+    exps = [math.exp(logit - top) for logit in logits]
+    total = sum(exps)
+    return [value / total for value in exps]
+
+# Function to classify several texts with every (window x label) pair scored in shared batches
+def classify_texts(classifier, texts, labels, reducer="mean", template=HYPOTHESIS_TEMPLATE,
+                   batch_size=CLASSIFY_BATCH_SIZE, max_windows=MAX_WINDOWS):
+    """Zero-shot classify whole texts instead of only their first model window.
+
+    Each text is split into token windows, every window is paired with every label
+    hypothesis, and the pairs are run through the NLI model in length-sorted batches.
+    Returns one {'labels', 'scores', 'windows'} dict per text, labels sorted by score.
+    """
+    import torch
+
+    tokenizer, model = classifier.tokenizer, classifier.model
+    hypotheses = hypothesis_ids(tokenizer, labels, template)
+    max_length = min(tokenizer.model_max_length, 1024)
+    window_tokens = max_length - max(len(h) for h in hypotheses) - tokenizer.num_special_tokens_to_add(pair=True)
+
+    pairs, window_lengths = [], []
+    for text_index, text in enumerate(texts):
+        windows = token_windows(tokenizer, text, window_tokens, max_windows)
+        window_lengths.append([len(window) for window in windows])
+        for window_index, window in enumerate(windows):
+            for label_index, hypothesis in enumerate(hypotheses):
+                pairs.append((text_index, window_index, label_index,
+                              tokenizer.build_inputs_with_special_tokens(window, hypothesis)))
+
+    # Similar lengths share a batch, which keeps padding small
+    order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][3]))
+    entail = entailment_index(model)
+    logits = {}
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            encoded = tokenizer.pad({"input_ids": [pairs[i][3] for i in batch]}, return_tensors="pt")
+            MODEL_BATCH_SIZE.observe(len(batch), model="classifier")
+            STAGE_TOKENS.inc(int(encoded["attention_mask"].sum()), stage="classify")
+            output = model(input_ids=encoded["input_ids"], attention_mask=encoded["attention_mask"])
+            for i, value in zip(batch, output.logits[:, entail].tolist()):
+                text_index, window_index, label_index, _ = pairs[i]
+                logits[(text_index, window_index, label_index)] = value
+
+    results = []
+    for text_index, lengths in enumerate(window_lengths):
+        window_scores = [
+            _softmax([logits[(text_index, window_index, label_index)] for label_index in range(len(labels))])
+            for window_index in range(len(lengths))
+        ]
+        scores = reduce_scores(window_scores, lengths, reducer)
+        ranked = sorted(zip(labels, scores), key=lambda item: item[1], reverse=True)
+        results.append({
+            "labels": [label for label, _ in ranked],
+            "scores": [score for _, score in ranked],
+            "windows": len(lengths),
+        })
+    return results
+
+# Function to classify a single text; see classify_texts
+def classify_text(classifier, text, labels, reducer="mean", **kwargs):
+    return classify_texts(classifier, [text], labels, reducer, **kwargs)[0]
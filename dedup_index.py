@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_INDEX_PATH = os.environ.get("SMART_ARTICLE_DEDUP_PATH", os.path.join(".cache", "dedup.sqlite3"))
+# Minimum estimated Jaccard similarity of word shingles for two articles to count as duplicates
+DEFAULT_THRESHOLD = float(os.environ.get("SMART_ARTICLE_DEDUP_THRESHOLD", "0.8"))
+# Articles kept in the index; compaction drops the oldest beyond this
+DEFAULT_MAX_DOCUMENTS = int(os.environ.get("SMART_ARTICLE_DEDUP_MAX_DOCUMENTS", "100000"))
+NUM_PERM = 128
+SHINGLE_WORDS = 5
+# Compact automatically after this many inserts
+COMPACT_EVERY = 1000
+
+_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+
+# Function to split text into hashed word shingles
+def shingle_hashes(text, size=SHINGLE_WORDS):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+# Function to pick the band layout whose LSH threshold sits a little below the similarity threshold
+def choose_bands(num_perm, threshold):
+    """Return (bands, rows). Pairs at the threshold become candidates with high probability;
+    candidates are then checked against the full signatures."""
+    target = threshold * 0.85
+    layouts = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(layouts, key=lambda layout: abs((1 / layout[0]) ** (1 / layout[1]) - target))
+
+
+class MinHasher:
+    """MinHash signatures from universal hash functions (a * x + b) mod p"""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.coefficients = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        if np is not None:
+            self._a = np.array([a for a, _ in self.coefficients], dtype=np.uint64)[:, None]
+            self._b = np.array([b for _, b in self.coefficients], dtype=np.uint64)[:, None]
+
+    def signature(self, text):
+        hashes = shingle_hashes(text)
+        if np is not None:
+            # a, b < 2^31 and x < 2^32, so a * x + b fits in 64 bits
+            values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))[None, :]
+            return [int(v) for v in ((self._a * values + self._b) % _PRIME).min(axis=1)]
+        return [min((a * x + b) % _PRIME for x in hashes) for a, b in self.coefficients]
+
+# Function to estimate Jaccard similarity from two signatures
+def estimate_similarity(first, second):
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+class DedupIndex:
+    """Persistent MinHash/LSH index of analyzed articles and their results.
+
+    Each article's signature is split into bands; articles sharing a band bucket are
+    candidates, and the best candidate whose estimated similarity reaches the threshold
+    is returned. Results are stored per `config` so a change of model settings never
+    reuses results produced under different ones.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM,
+                 max_documents=DEFAULT_MAX_DOCUMENTS):
+        self.path = path
+        self.threshold = threshold
+        self.max_documents = max_documents
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        self.stats_counts = {"queries": 0, "matches": 0, "inserts": 0}
+        self._inserts_since_compact = 0
+        self._lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " id INTEGER PRIMARY KEY, fingerprint TEXT NOT NULL, config TEXT NOT NULL, signature BLOB NOT NULL,"
+            " result TEXT NOT NULL, created REAL NOT NULL, UNIQUE (fingerprint, config));"
+            "CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, bucket INTEGER NOT NULL, doc_id INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS bands_lookup ON bands(band, bucket);"
+            "CREATE INDEX IF NOT EXISTS bands_doc ON bands(doc_id);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        layout = json.dumps([num_perm, self.bands, self.rows])
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'layout'").fetchone()
+        if row is None or row[0] != layout:
+            # Signatures are kept, so a new band layout only needs the buckets rebuilt
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('layout', ?)", (layout,))
+            self._rebuild_bands()
+        self._conn.commit()
+
+    def _buckets(self, signature):
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(array('I', rows).tobytes(), digest_size=8).digest()
+            yield band, int.from_bytes(digest, "big", signed=True)
+
+    def _rebuild_bands(self):
+        self._conn.execute("DELETE FROM bands")
+        for doc_id, blob in self._conn.execute("SELECT id, signature FROM documents").fetchall():
+            signature = list(array('I', blob))
+            self._conn.executemany("INSERT INTO bands (band, bucket, doc_id) VALUES (?, ?, ?)",
+                                   [(band, bucket, doc_id) for band, bucket in self._buckets(signature)])
+
+    def query(self, text, config="", signature=None):
+        """Return {"similarity", "result", "fingerprint"} for the closest stored duplicate, or None"""
+        signature = signature or self.hasher.signature(text)
+        with self._lock:
+            self.stats_counts["queries"] += 1
+            candidates = set()
+            for band, bucket in self._buckets(signature):
+                candidates.update(doc_id for (doc_id,) in self._conn.execute(
+                    "SELECT doc_id FROM bands WHERE band = ? AND bucket = ?", (band, bucket)))
+            best = None
+            for doc_id in candidates:
+                row = self._conn.execute("SELECT fingerprint, signature, result FROM documents WHERE id = ? AND config = ?",
+                                         (doc_id, config)).fetchone()
+                if row is None:
+                    continue
+                similarity = estimate_similarity(signature, array('I', row[1]))
+                if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                    best = {"similarity": similarity, "fingerprint": row[0], "result": json.loads(row[2])}
+            if best:
+                self.stats_counts["matches"] += 1
+        return best
+
+    def insert(self, text, fingerprint, result, config="", signature=None):
+        """Add an analyzed article; a fingerprint already stored for this config is left as is"""
+        signature = signature or self.hasher.signature(text)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO documents (fingerprint, config, signature, result, created) VALUES (?, ?, ?, ?, ?)",
+                (fingerprint, config, array('I', signature).tobytes(), json.dumps(result), time.time())
+            )
+            if cursor.rowcount:
+                self._conn.executemany("INSERT INTO bands (band, bucket, doc_id) VALUES (?, ?, ?)",
+                                       [(band, bucket, cursor.lastrowid) for band, bucket in self._buckets(signature)])
+                self.stats_counts["inserts"] += 1
+                self._inserts_since_compact += 1
+            self._conn.commit()
+        if self._inserts_since_compact >= COMPACT_EVERY:
+            self.compact()
+
+    def compact(self, max_documents=None):
+        """Drop the oldest articles beyond `max_documents`, remove orphaned buckets and reclaim space"""
+        max_documents = self.max_documents if max_documents is None else max_documents
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM documents WHERE id NOT IN (SELECT id FROM documents ORDER BY created DESC LIMIT ?)",
+                (max_documents,)
+            )
+            self._conn.execute("DELETE FROM bands WHERE doc_id NOT IN (SELECT id FROM documents)")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+            self._inserts_since_compact = 0
+
+    def stats(self):
+        with self._lock:
+            documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {"documents": documents, "bands": self.bands, "rows": self.rows, **self.stats_counts}
@@ -0,0 +1,147 @@
+import os
+import time
+from chunker import max_input_tokens
+
+# When to reduce chunk summaries level by level: "auto" (long inputs only), "on" or "off"
+HIERARCHY_MODE = os.environ.get("SMART_ARTICLE_HIERARCHY", "auto")
+# In auto mode, inputs with at least this many chunk summaries are reduced hierarchically
+HIERARCHY_MIN_CHUNKS = int(os.environ.get("SMART_ARTICLE_HIERARCHY_MIN_CHUNKS", "24"))
+# Per-level "fan_in:max_length" settings; the last one is reused for any deeper level
+HIERARCHY_LEVELS = os.environ.get("SMART_ARTICLE_HIERARCHY_LEVELS", "8:120,6:150")
+# Groups summarized together in one model call
+REDUCE_BATCH_SIZE = 8
+
+
+class LevelConfig:
+    """How one level groups its inputs: at most `fan_in` texts per group, summarized to `max_length` tokens"""
+
+    def __init__(self, fan_in=8, max_length=120, min_length=30):
+        self.fan_in = max(2, fan_in)
+        self.max_length = max_length
+        self.min_length = min(min_length, max_length)
+
+    def __repr__(self):
+        return f"{self.fan_in}:{self.max_length}"
+
+# Function to parse "fan_in:max_length,..." into level configs
+def parse_levels(spec):
+    levels = []
+    for item in spec.split(','):
+        if ':' in item:
+            fan_in, max_length = item.split(':', 1)
+            levels.append(LevelConfig(int(fan_in), int(max_length)))
+        elif item.strip():
+            levels.append(LevelConfig(int(item)))
+    return levels or [LevelConfig()]
+
+
+class _Level:
+    __slots__ = ('config', 'group', 'group_tokens', 'ready', 'received', 'emitted', 'calls', 'seconds')
+
+    def __init__(self, config):
+        self.config = config
+        self.group = []
+        self.group_tokens = 0
+        self.ready = []
+        self.received = 0
+        self.emitted = 0
+        self.calls = 0
+        self.seconds = 0.0
+
+
+class HierarchicalReducer:
+    """Reduces a stream of chunk summaries to a handful of summaries with bounded memory.
+
+    Summaries are packed into groups that fit the model's input window (at most
+    `fan_in` per group); full groups are summarized in batches and the results are
+    pushed to the next level, which groups them again. Only the open group and a
+    batch of ready groups are kept per level, so memory grows with the number of
+    levels (logarithmic in the input), not with the number of chunks.
+    """
+
+    def __init__(self, summarize, tokenizer, levels=None, batch_size=REDUCE_BATCH_SIZE):
+        # summarize(texts, max_length, min_length) -> list of summaries
+        self.summarize = summarize
+        self.tokenizer = tokenizer
+        self.configs = levels or parse_levels(HIERARCHY_LEVELS)
+        self.batch_size = max(1, batch_size)
+        self.budget = max_input_tokens(tokenizer)
+        self.levels = []
+        # Two summaries of a level must fit into one group of the next, or the levels would never shrink
+        for config in self.configs:
+            if 2 * config.max_length >= self.budget:
+                raise ValueError(f"Hierarchy level {config!r}: max_length must be below half of the "
+                                 f"{self.budget}-token model input")
+
+    def _level(self, depth):
+        while len(self.levels) <= depth:
+            config = self.configs[min(len(self.levels), len(self.configs) - 1)]
+            self.levels.append(_Level(config))
+        return self.levels[depth]
+
+    def _tokens(self, text):
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def add(self, summary, depth=0):
+        level = self._level(depth)
+        level.received += 1
+        tokens = self._tokens(summary)
+        # Groups always take at least two summaries so every level shrinks; the model truncates an oversized pair
+        full = len(level.group) >= level.config.fan_in
+        if full or (len(level.group) >= 2 and level.group_tokens + tokens > self.budget):
+            self._close_group(depth)
+        level.group.append(summary)
+        level.group_tokens += tokens
+        if len(level.ready) >= self.batch_size:
+            self._reduce(depth)
+
+    def extend(self, summaries):
+        for summary in summaries:
+            self.add(summary)
+
+    def _close_group(self, depth):
+        level = self.levels[depth]
+        if level.group:
+            level.ready.append(" ".join(level.group))
+            level.group, level.group_tokens = [], 0
+
+    # Function to summarize the ready groups of a level and pass the results up
+    def _reduce(self, depth):
+        level = self.levels[depth]
+        if not level.ready:
+            return
+        groups, level.ready = level.ready, []
+        start = time.perf_counter()
+        summaries = self.summarize(groups, level.config.max_length, level.config.min_length)
+        level.seconds += time.perf_counter() - start
+        level.calls += 1
+        level.emitted += len(groups)
+        for summary in summaries:
+            self.add(summary, depth + 1)
+
+    def finish(self):
+        """Flush every level and return the top-level summaries (at most one group's worth)"""
+        depth = 0
+        while depth < len(self.levels):
+            level = self.levels[depth]
+            # A level that never had to reduce and fits in one group holds the final summaries
+            if not level.emitted and not level.ready and len(level.group) <= level.config.fan_in:
+                return list(level.group)
+            self._close_group(depth)
+            self._reduce(depth)
+            depth += 1
+        return []
+
+    def stats(self):
+        return [{"level": depth + 1, "config": repr(level.config), "inputs": level.received,
+                 "groups": level.emitted, "calls": level.calls, "seconds": round(level.seconds, 3)}
+                for depth, level in enumerate(self.levels) if level.emitted]
+
+# Function to decide whether a summary count should be reduced hierarchically
+def use_hierarchy(summary_count, mode=None, min_chunks=None):
+    mode = mode or HIERARCHY_MODE
+    if mode == "on":
+        return True
+    if mode == "auto":
+        return summary_count >= (min_chunks or HIERARCHY_MIN_CHUNKS)
+    return False
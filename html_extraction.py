@@ -0,0 +1,259 @@
+import os
+import re
+from html.parser import HTMLParser
+
+# Parser backend: "auto" uses lxml when installed, otherwise the standard library parser
+PARSER_BACKEND = os.environ.get("SMART_ARTICLE_HTML_PARSER", "auto")
+MIN_ARTICLE_CHARS = 100
+# Login prompts only count as a wall when the extracted content is this short
+LOGIN_CHECK_MAX_CHARS = 1500
+
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'canvas', 'form', 'button', 'select'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+BOILERPLATE_TAGS = {'nav', 'header', 'footer', 'aside'}
+CANDIDATE_TAGS = {'article', 'main', 'section', 'div', 'td', 'body'}
+# Text inside these tags counts as running prose
+PROSE_TAGS = {'p', 'blockquote', 'pre', 'li', 'h2', 'h3', 'h4', 'dd'}
+# Tags that implicitly close an open <p> when they start
+CLOSES_P = {'p', 'div', 'section', 'article', 'ul', 'ol', 'table', 'blockquote', 'pre', 'h1', 'h2', 'h3',
+            'h4', 'h5', 'h6', 'header', 'footer', 'nav', 'aside', 'main', 'figure'}
+
+POSITIVE_RE = re.compile(r'article|content|post|body|entry|story|text|main|abstract|publication', re.I)
+NEGATIVE_RE = re.compile(r'comment|footer|nav|sidebar|menu|share|social|related|promo|advert|banner|cookie|'
+                         r'newsletter|popup|modal|breadcrumb|widget|recommend|subscribe', re.I)
+PAYWALL_RE = re.compile(r'paywall|regwall|subscriber-only|subscribers-only|premium-content|meter-wall|'
+                        r'login-wall|piano-', re.I)
+# Calls to log in or subscribe; only looked for outside the block's paragraphs, so articles about logins are kept
+LOGIN_RE = re.compile(r'\b(?:(?:log ?in|sign ?in|sign up|register|subscribe)(?: now)? (?:to|for) (?:continue|keep|read|view|'
+                      r'access|unlock)|log in to view|access restricted|subscribers only|already a subscriber)\b', re.I)
+
+
+class ExtractionResult:
+    def __init__(self, title, text, error=None, paywalled=False):
+        self.title = title
+        self.text = text
+        self.error = error
+        self.paywalled = paywalled
+
+
+class _Frame:
+    __slots__ = ('tag', 'first', 'text', 'prose', 'loose', 'links', 'paywall', 'weight', 'boilerplate')
+
+    def __init__(self, tag, first, weight, boilerplate):
+        self.tag = tag
+        self.first = first
+        self.text = 0
+        self.prose = 0
+        # Non-link text outside prose tags, e.g. article text in <div>s broken up by <br>
+        self.loose = 0
+        self.links = 0
+        self.paywall = False
+        self.weight = weight
+        self.boilerplate = boilerplate
+
+
+class DensityExtractor:
+    """Parser target that scores content blocks by text and link density in a single pass.
+
+    Fragments of text are appended to one list as they stream in; each open element
+    only remembers where its text starts and accumulates counts, which are added to
+    its parent when it closes. Candidate containers are scored as they close, so the
+    document is never held as a tree. Pages without any prose tags are scored on
+    their loose text instead.
+    """
+
+    def __init__(self):
+        self.fragments = []
+        self.fragment_is_boilerplate = []
+        self.fragment_is_prose = []
+        self.stack = [_Frame('#root', 0, 1.0, False)]
+        self.title_parts = []
+        self.in_title = False
+        self.title_done = False
+        self.skip_depth = 0
+        self.link_depth = 0
+        self.prose_depth = 0
+        self.best = None
+        self.best_loose = None
+
+    def _classes(self, attrs):
+        return f"{attrs.get('class') or ''} {attrs.get('id') or ''} {attrs.get('role') or ''}"
+
+    def start(self, tag, attrs):
+        tag = tag.lower()
+        if tag == 'input' and (attrs.get('type') or '').lower() == 'password':
+            # A login form; the <form> itself is skipped, so its container is marked
+            self.stack[-1].paywall = True
+        if tag in VOID_TAGS:
+            return
+        if self.skip_depth or tag in SKIP_TAGS:
+            self.skip_depth += tag in SKIP_TAGS
+            return
+        # Only the first <title> outside <svg> and friends is the page title
+        if tag == 'title':
+            self.in_title = not self.title_done
+            return
+        if tag in CLOSES_P and self.stack[-1].tag == 'p':
+            self.end('p')
+        parent = self.stack[-1]
+        classes = self._classes(attrs)
+        weight = 1.0
+        if tag in ('article', 'main') or attrs.get('role') in ('article', 'main') or POSITIVE_RE.search(classes):
+            weight = 1.25
+        boilerplate = parent.boilerplate or tag in BOILERPLATE_TAGS or bool(NEGATIVE_RE.search(classes))
+        frame = _Frame(tag, len(self.fragments), weight, boilerplate)
+        frame.paywall = bool(PAYWALL_RE.search(classes))
+        self.stack.append(frame)
+        if tag == 'a':
+            self.link_depth += 1
+        if tag in PROSE_TAGS:
+            self.prose_depth += 1
+
+    def end(self, tag):
+        tag = tag.lower()
+        if tag in VOID_TAGS:
+            return
+        if tag == 'title':
+            if self.in_title:
+                self.in_title = False
+                self.title_done = True
+            return
+        if self.skip_depth:
+            self.skip_depth -= tag in SKIP_TAGS
+            return
+        if not any(frame.tag == tag for frame in self.stack[1:]):
+            return
+        # Close any elements left open inside this one (unclosed <p>, <li>, ...)
+        while True:
+            frame = self.stack.pop()
+            self._close(frame)
+            if frame.tag == tag:
+                return
+
+    def _close(self, frame):
+        if frame.tag == 'a':
+            self.link_depth -= 1
+        if frame.tag in PROSE_TAGS:
+            self.prose_depth -= 1
+        if frame.tag in CANDIDATE_TAGS:
+            self._score(frame)
+        parent = self.stack[-1]
+        parent.text += frame.text
+        parent.links += frame.links
+        parent.paywall = parent.paywall or frame.paywall
+        if not frame.boilerplate:
+            parent.prose += frame.prose
+            parent.loose += frame.loose
+
+    def _score(self, frame):
+        if not frame.text:
+            return
+        # Dense, link-poor prose scores highest; boilerplate wrappers score nothing
+        link_factor = (1 - frame.links / frame.text) * frame.weight
+        candidate = (frame.prose * (frame.prose / frame.text) * link_factor, frame.first, len(self.fragments), frame.paywall)
+        if self.best is None or candidate[0] > self.best[0]:
+            self.best = candidate
+        loose = frame.prose + frame.loose
+        candidate = (loose * (loose / frame.text) * link_factor,) + candidate[1:]
+        if self.best_loose is None or candidate[0] > self.best_loose[0]:
+            self.best_loose = candidate
+
+    def data(self, text):
+        if self.in_title:
+            self.title_parts.append(text)
+            return
+        if self.skip_depth:
+            return
+        text = text.strip()
+        if not text:
+            return
+        frame = self.stack[-1]
+        self.fragments.append(text)
+        self.fragment_is_boilerplate.append(frame.boilerplate)
+        self.fragment_is_prose.append(bool(self.prose_depth) and not self.link_depth)
+        frame.text += len(text)
+        if self.link_depth:
+            frame.links += len(text)
+        elif self.prose_depth and not frame.boilerplate:
+            frame.prose += len(text)
+        elif not frame.boilerplate:
+            frame.loose += len(text)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        while len(self.stack) > 1:
+            self._close(self.stack.pop())
+        # Fragments without a <body> still get a candidate
+        self._score(self.stack[0])
+        return self
+
+    def result(self):
+        title = " ".join(" ".join(self.title_parts).split()) or "Untitled"
+        best = self.best if self.best is not None and self.best[0] > 0 else self.best_loose
+        if best is None or best[0] <= 0:
+            return ExtractionResult(title, "", "no content")
+        _, first, last, paywall = best
+        text = " ".join(fragment for fragment, boilerplate in
+                        zip(self.fragments[first:last], self.fragment_is_boilerplate[first:last]) if not boilerplate)
+        if not paywall and len(text) < LOGIN_CHECK_MAX_CHARS:
+            notices = " ".join(fragment for fragment, boilerplate, prose in
+                               zip(self.fragments[first:last], self.fragment_is_boilerplate[first:last],
+                                   self.fragment_is_prose[first:last]) if not boilerplate and not prose)
+            paywall = bool(LOGIN_RE.search(notices))
+        return ExtractionResult(title, text, paywalled=paywall)
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+# Function to pick the parser backend
+def resolve_backend(backend=None):
+    backend = backend or PARSER_BACKEND
+    if backend == "auto":
+        try:
+            import lxml.etree  # noqa: F401
+            return "lxml"
+        except ImportError:
+            return "html.parser"
+    return backend
+
+# Function to stream an HTML document through the density extractor
+def extract_html(html, backend=None):
+    """Return an ExtractionResult with the title and main text of an HTML page"""
+    target = DensityExtractor()
+    backend = resolve_backend(backend)
+    if backend == "lxml":
+        from lxml import etree
+        parser = etree.HTMLParser(target=target, recover=True)
+        parser.feed(html)
+        parser.close()
+    elif backend == "html.parser":
+        parser = _StdlibParser(target)
+        parser.feed(html)
+        parser.close()
+        target.close()
+    else:
+        raise ValueError(f"Unknown HTML parser backend '{backend}', expected 'auto', 'lxml' or 'html.parser'")
+    result = target.result()
+    if result.paywalled:
+        result.error = "paywall"
+    elif len(result.text) < MIN_ARTICLE_CHARS:
+        result.error = "no content"
+    return result
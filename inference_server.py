@@ -0,0 +1,350 @@
+import argparse
+import logging
+import os
+import queue
+import secrets
+import socket
+import stat
+import struct
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Connection, Listener, answer_challenge, deliver_challenge
+from instrumentation import MODEL_BATCH_SIZE, configure_logging, start_metrics_server
+
+# Where the shared inference server listens, e.g. "127.0.0.1:6001" (unset = run models in-process)
+DEFAULT_ADDRESS = os.environ.get("SMART_ARTICLE_INFERENCE_SERVER") or "127.0.0.1:6001"
+# Shared secret for the connection handshake. Messages are pickled, so anyone holding the key can run
+# code in the server: without SMART_ARTICLE_INFERENCE_KEY, the server generates a random key in a file
+# only its user can read, and clients on the same machine read it from there
+AUTHKEY_ENV = os.environ.get("SMART_ARTICLE_INFERENCE_KEY", "")
+AUTHKEY_FILE = os.environ.get("SMART_ARTICLE_INFERENCE_KEY_FILE", os.path.join(".cache", "inference.key"))
+# Micro-batching limits: requests per batch and how long the first request waits for company
+MAX_BATCH = 16
+MAX_WAIT_MS = 25
+# Requests admitted but not yet finished; beyond this the server answers "busy"
+MAX_PENDING = 64
+# Seconds a connection gets to finish the key handshake, and a client waits to connect or for a reply
+HANDSHAKE_TIMEOUT = 5.0
+CONNECT_TIMEOUT = float(os.environ.get("SMART_ARTICLE_INFERENCE_CONNECT_TIMEOUT", "10"))
+REQUEST_TIMEOUT = float(os.environ.get("SMART_ARTICLE_INFERENCE_TIMEOUT", "300"))
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceBusyError(RuntimeError):
+    pass
+
+
+# Function to read the shared key, generating the key file when asked to (server side)
+def load_authkey(create=False, path=None):
+    if AUTHKEY_ENV:
+        return AUTHKEY_ENV.encode('utf-8')
+    path = path or AUTHKEY_FILE
+    if create and not os.path.exists(path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            # Another server created it first; use that key
+            pass
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+            logger.info("🔑 Generated inference server key", extra={"path": path})
+    try:
+        mode = os.stat(path).st_mode
+        with open(path, encoding="utf-8") as f:
+            key = f.read().strip()
+    except FileNotFoundError:
+        raise RuntimeError(f"No inference server key: set SMART_ARTICLE_INFERENCE_KEY or start the server "
+                           f"to create {path}") from None
+    if mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise RuntimeError(f"Inference server key file {path} is readable by other users; chmod 600 it")
+    if not key:
+        raise RuntimeError(f"Inference server key file {path} is empty")
+    return key.encode('utf-8')
+
+# Function to make blocking reads on a connection fail after `seconds` (0 waits forever)
+def _set_recv_timeout(conn, seconds):
+    # A duplicate of the socket shares its options; closing it leaves the connection open
+    sock = socket.socket(fileno=os.dup(conn.fileno()))
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO,
+                        struct.pack("ll", int(seconds), int(seconds % 1 * 1_000_000)))
+    finally:
+        sock.close()
+
+# Function to run the mutual key handshake of multiprocessing.connection with a deadline
+def authenticate(conn, authkey, server, timeout=HANDSHAKE_TIMEOUT):
+    """Raises AuthenticationError for a wrong key, and EOFError or OSError for a dead or silent peer"""
+    _set_recv_timeout(conn, timeout)
+    if server:
+        deliver_challenge(conn, authkey)
+        answer_challenge(conn, authkey)
+    else:
+        answer_challenge(conn, authkey)
+        deliver_challenge(conn, authkey)
+    _set_recv_timeout(conn, 0)
+
+# Function to check a request message, returning an error message or None
+def validate_message(message):
+    if not isinstance(message, dict):
+        return "Malformed request"
+    op = message.get("op")
+    if op == "classify":
+        labels = message.get("labels")
+        if not isinstance(message.get("text"), str):
+            return "classify needs a 'text' string"
+        if not labels or not isinstance(labels, list) or not all(isinstance(label, str) for label in labels):
+            return "classify needs a non-empty 'labels' list of strings"
+        if not isinstance(message.get("reducer", "mean"), str):
+            return "'reducer' must be a string"
+    elif op == "summarize":
+        chunks = message.get("chunks")
+        if not isinstance(chunks, list) or not all(isinstance(chunk, str) for chunk in chunks):
+            return "summarize needs a 'chunks' list of strings"
+        for key in ("max_length", "min_length"):
+            value = message.get(key)
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value <= 0):
+                return f"'{key}' must be a positive integer"
+    else:
+        return f"Unknown operation: {op}"
+    return None
+
+# Function to turn "host:port" into a Listener/Client address
+def parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+class _Request:
+    def __init__(self, op, payload):
+        self.op = op
+        self.payload = payload
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class InferenceServer:
+    """Collects classify/summarize requests from many clients and runs them in micro-batches"""
+
+    def __init__(self, address=DEFAULT_ADDRESS, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, max_pending=MAX_PENDING):
+        self.address = parse_address(address)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.authkey = None
+        self.stats = {"requests": 0, "busy": 0, "rejected": 0, "batches": 0, "batched_requests": 0}
+        # Handler threads and the batching thread both update stats
+        self._stats_lock = threading.Lock()
+
+    def _count(self, **amounts):
+        with self._stats_lock:
+            for key, amount in amounts.items():
+                self.stats[key] += amount
+
+    # Function to answer one client connection until it closes
+    def _handle(self, conn):
+        with conn:
+            # The handshake runs here rather than in accept(), so a silent or bogus peer only holds its own thread
+            try:
+                authenticate(conn, self.authkey, server=True)
+            except (AuthenticationError, EOFError, OSError) as e:
+                self._count(rejected=1)
+                logger.warning("⚠️ Rejected inference connection: %s", e or type(e).__name__)
+                return
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    # Undecodable data; nothing after it on this connection can be trusted
+                    logger.warning("⚠️ Dropping inference connection after a bad message: %s", e)
+                    return
+                error = validate_message(message)
+                if error:
+                    self._count(rejected=1)
+                    reply = {"status": "error", "error": error}
+                else:
+                    reply = self._submit(_Request(message["op"], message))
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    # The client went away while its request was running
+                    return
+
+    # Function to queue a request for the batcher and wait for its reply
+    def _submit(self, request):
+        try:
+            self.pending.put_nowait(request)
+        except queue.Full:
+            self._count(busy=1)
+            return {"status": "busy"}
+        self._count(requests=1)
+        request.done.wait()
+        if request.error:
+            return {"status": "error", "error": request.error}
+        return {"status": "ok", "result": request.result}
+
+    def _accept(self, listener):
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError as e:
+                logger.warning("⚠️ Failed to accept an inference connection: %s", e)
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    # Function to collect the next micro-batch: block for one request, then wait briefly for more
+    def _next_batch(self):
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batch(self, batch):
+        try:
+            self._run_requests(batch)
+        except Exception as e:
+            logger.exception("❌ Inference batch failed: %s", e)
+            for request in batch:
+                if request.result is None and request.error is None:
+                    request.error = str(e)
+        finally:
+            self._count(batches=1, batched_requests=len(batch))
+            MODEL_BATCH_SIZE.observe(len(batch), model="inference_server")
+            for request in batch:
+                request.done.set()
+
+    def _run_requests(self, batch):
+        import smart_article_tool
+        from classification import classify_texts
+
+        classify_groups = {}
+        summarize_requests = []
+        for request in batch:
+            if request.op == "classify":
+                key = (tuple(request.payload["labels"]), request.payload.get("reducer", "mean"))
+                classify_groups.setdefault(key, []).append(request)
+            else:
+                summarize_requests.append(request)
+
+        # Requests with the same label set share one set of NLI batches
+        for (labels, reducer), requests in classify_groups.items():
+            try:
+                results = classify_texts(smart_article_tool.get_classifier(), [r.payload["text"] for r in requests],
+                                         list(labels), reducer)
+                for request, result in zip(requests, results):
+                    request.result = result
+            except Exception as e:
+                for request in requests:
+                    request.error = str(e)
+
+        # Chunks of all summarize requests with the same length settings are summarized together,
+        # then split back per request
+        summarize_groups = {}
+        for request in summarize_requests:
+            key = (request.payload.get("max_length"), request.payload.get("min_length") or smart_article_tool.SUMMARY_MIN_LENGTH)
+            summarize_groups.setdefault(key, []).append(request)
+        for (max_length, min_length), requests in summarize_groups.items():
+            chunks = [chunk for request in requests for chunk in request.payload["chunks"]]
+            try:
+                summaries = smart_article_tool.summarize_chunks(chunks, keep_failed=True, max_length=max_length, min_length=min_length)
+                offset = 0
+                for request in requests:
+                    count = len(request.payload["chunks"])
+                    request.result = [summary for summary in summaries[offset:offset + count] if summary is not None]
+                    offset += count
+            except Exception as e:
+                for request in requests:
+                    request.error = str(e)
+
+    def serve_forever(self, preload=True):
+        import smart_article_tool
+        # The server runs the models itself, even if its environment points at a server
+        smart_article_tool.INFERENCE_SERVER = ""
+        self.authkey = load_authkey(create=True)
+        if preload:
+            smart_article_tool.preload_models()
+        # No authkey here: each connection is authenticated in its own handler thread
+        listener = Listener(self.address, backlog=128)
+        threading.Thread(target=self._accept, args=(listener,), daemon=True).start()
+        logger.info("🚀 Inference server listening", extra={"address": f"{self.address[0]}:{self.address[1]}"})
+        while True:
+            self._run_batch(self._next_batch())
+
+
+class InferenceClient:
+    """Client for InferenceServer; keeps one connection per calling thread"""
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.address = parse_address(address)
+        self.authkey = load_authkey()
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=CONNECT_TIMEOUT)
+        sock.settimeout(None)
+        conn = Connection(sock.detach())
+        try:
+            authenticate(conn, self.authkey, server=False, timeout=CONNECT_TIMEOUT)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _call(self, message):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        try:
+            conn.send(message)
+            if not conn.poll(REQUEST_TIMEOUT):
+                raise TimeoutError(f"The inference server did not answer within {REQUEST_TIMEOUT:.0f} seconds.")
+            reply = conn.recv()
+        except (EOFError, OSError):
+            # Also covers TimeoutError; a late reply must not be read as the answer to the next request
+            self._local.conn = None
+            conn.close()
+            raise
+        if reply["status"] == "busy":
+            raise InferenceBusyError("The inference server is busy. Please try again in a moment.")
+        if reply["status"] == "error":
+            raise RuntimeError(reply["error"])
+        return reply["result"]
+
+    def classify(self, text, labels, reducer="mean"):
+        return self._call({"op": "classify", "text": text, "labels": list(labels), "reducer": reducer})
+
+    def summarize(self, chunks, max_length=None, min_length=None):
+        message = {"op": "summarize", "chunks": list(chunks)}
+        if max_length:
+            message.update(max_length=max_length, min_length=min_length)
+        return self._call(message)
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared inference server with micro-batching.")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="host:port to listen on")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Requests per micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS, help="How long a batch waits to fill up")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="Admitted requests before answering busy")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+    args = parser.parse_args()
+    configure_logging()
+    start_metrics_server(args.metrics_port)
+    InferenceServer(args.address, args.max_batch, args.max_wait_ms, args.max_pending).serve_forever()
+
+if __name__ == "__main__":
+    main()
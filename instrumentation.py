@@ -0,0 +1,306 @@
+import cProfile
+import functools
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Log level and format ("text" or "json", one object per line)
+LOG_LEVEL = os.environ.get("SMART_ARTICLE_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("SMART_ARTICLE_LOG_FORMAT", "text")
+# Port of the Prometheus /metrics endpoint (0 disables it); it only listens on localhost by default
+METRICS_PORT = int(os.environ.get("SMART_ARTICLE_METRICS_PORT", "0"))
+METRICS_HOST = os.environ.get("SMART_ARTICLE_METRICS_HOST", "127.0.0.1")
+# Requests taking at least this many seconds keep their cProfile output (0 disables profiling)
+PROFILE_SLOW_SECONDS = float(os.environ.get("SMART_ARTICLE_PROFILE_SLOW", "0"))
+# Fraction of requests profiled while slow-request profiling is on
+PROFILE_SAMPLE_RATE = float(os.environ.get("SMART_ARTICLE_PROFILE_SAMPLE", "1.0"))
+PROFILE_DIR = os.environ.get("SMART_ARTICLE_PROFILE_DIR", os.path.join(".cache", "profiles"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+logger = logging.getLogger(__name__)
+_profiling = threading.local()
+_profile_ids = itertools.count(1)
+_metrics_server = None
+_logging_configured = False
+_server_lock = threading.Lock()
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts, sum, count]
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, [f'le="{_format_value(bound)}"'])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key, ['le="+Inf"'])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total!r}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics of this process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram("smart_article_stage_seconds", "Time spent in each analysis stage", ("stage",))
+STAGE_BYTES = REGISTRY.counter("smart_article_bytes_total", "Bytes read or produced by each stage", ("stage",))
+STAGE_TOKENS = REGISTRY.counter("smart_article_tokens_total", "Model tokens processed by each stage", ("stage",))
+CACHE_LOOKUPS = REGISTRY.counter("smart_article_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"))
+MODEL_BATCH_SIZE = REGISTRY.histogram("smart_article_model_batch_size", "Inputs per model call", ("model",), BATCH_BUCKETS)
+ANALYSES = REGISTRY.counter("smart_article_analyses_total", "Finished analyses by outcome", ("outcome",))
+CASCADE_DECISIONS = REGISTRY.counter("smart_article_cascade_total", "Cascade classifications by the stage that decided",
+                                     ("stage",))
+
+# Function to time a block as one stage, optionally adding its seconds to a timings dict
+@contextmanager
+def stage(name, timings=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        if timings is not None:
+            timings[name] = round(timings.get(name, 0) + elapsed, 4)
+        logger.debug("Stage finished", extra={"stage": name, "seconds": round(elapsed, 4)})
+
+# Function to count a cache lookup
+def record_cache(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("Metrics request: " + format, *args)
+
+# Function to serve /metrics from a background thread; starting it twice returns the running server
+def start_metrics_server(port=None, host=None):
+    """Returns the server, or None when no port is configured"""
+    global _metrics_server
+    port = METRICS_PORT if port is None else port
+    if not port:
+        return None
+    with _server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host or METRICS_HOST, port), _MetricsHandler)
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+            logger.info("📈 Serving metrics", extra={"url": f"http://{_metrics_server.server_address[0]}:{_metrics_server.server_address[1]}/metrics"})
+    return _metrics_server
+
+class _ProfiledRequest:
+    """Handle of a running profile_request; time spent paused is neither profiled nor counted"""
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.paused_seconds = 0.0
+
+    @contextmanager
+    def paused(self):
+        if self.profiler is None:
+            yield
+            return
+        self.profiler.disable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.paused_seconds += time.perf_counter() - start
+            self.profiler.enable()
+
+# Function to profile a request and keep the profile if it turns out to be slow
+@contextmanager
+def profile_request(name):
+    """cProfile the block when PROFILE_SLOW_SECONDS is set (sampled by PROFILE_SAMPLE_RATE).
+
+    Profiles of requests that took at least PROFILE_SLOW_SECONDS are written to
+    PROFILE_DIR for pstats or snakeviz; the warning logged with them carries the pid
+    and thread so a live process can also be inspected with `py-spy dump --pid`.
+    Nested requests on the same thread are covered by the outer profile. Yields a
+    handle whose paused() block is left out of both the profile and the duration.
+    """
+    if not PROFILE_SLOW_SECONDS or getattr(_profiling, "active", False) or random.random() >= PROFILE_SAMPLE_RATE:
+        yield _ProfiledRequest()
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler (e.g. a debugger) already owns this thread
+        yield _ProfiledRequest()
+        return
+    request = _ProfiledRequest(profiler)
+    _profiling.active = True
+    start = time.perf_counter()
+    try:
+        yield request
+    finally:
+        profiler.disable()
+        _profiling.active = False
+        elapsed = time.perf_counter() - start - request.paused_seconds
+        if elapsed >= PROFILE_SLOW_SECONDS:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{next(_profile_ids)}.prof")
+            profiler.dump_stats(path)
+            logger.warning("🐢 Slow request profiled", extra={"request": name, "seconds": round(elapsed, 3), "profile": path,
+                                                             "pid": os.getpid(), "thread_id": threading.get_ident()})
+
+# Function to decorate a generator function so each run is a profiled request
+def profiled(name):
+    """The profile covers the generator's own work only: it is paused while the consumer
+    handles each yielded item"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_request(name) as request:
+                items = func(*args, **kwargs)
+                try:
+                    while True:
+                        try:
+                            item = next(items)
+                        except StopIteration as stop:
+                            return stop.value
+                        with request.paused():
+                            yield item
+                finally:
+                    items.close()
+        return wrapper
+    return decorate
+
+
+class TextFormatter(logging.Formatter):
+    """`time level logger message key=value ...`, with the `extra` fields appended"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the `extra` fields as top-level keys"""
+
+    def format(self, record):
+        entry = {"time": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                 "message": record.getMessage()}
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+# Function to send log records to stderr in the configured format; only the first call takes effect
+def configure_logging(level=None, fmt=None):
+    global _logging_configured
+    if _logging_configured:
+        return
+    _logging_configured = True
+    root = logging.getLogger()
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if (fmt or LOG_FORMAT) == "json" else TextFormatter())
+    root.addHandler(handler)
+    root.setLevel(level or LOG_LEVEL)
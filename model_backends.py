@@ -0,0 +1,54 @@
+import logging
+import os
+
+# Supported inference backends for the transformers pipelines
+BACKENDS = ("torch", "torch-int8", "onnx")
+DEFAULT_BACKEND = os.environ.get("SMART_ARTICLE_BACKEND", "torch")
+# Exported ONNX graphs are kept here so the (slow) export only happens once per model
+ONNX_CACHE_DIR = os.environ.get("SMART_ARTICLE_ONNX_DIR", os.path.join(".cache", "onnx"))
+
+logger = logging.getLogger(__name__)
+
+# Function to load a PyTorch fp32 pipeline
+def _load_torch(task, model_name):
+    from transformers import pipeline
+    return pipeline(task, model=model_name)
+
+# Function to load a PyTorch pipeline with dynamically int8-quantized linear layers
+def _load_torch_int8(task, model_name):
+    import torch
+    pipe = _load_torch(task, model_name)
+    pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipe
+
+# Function to load an ONNX Runtime pipeline, exporting the model on first use
+def _load_onnx(task, model_name):
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSequenceClassification
+    except ImportError:
+        raise ImportError("The 'onnx' backend needs Optimum with ONNX Runtime: pip install optimum[onnxruntime]")
+    from transformers import AutoTokenizer, pipeline
+    model_class = ORTModelForSequenceClassification if task == "zero-shot-classification" else ORTModelForSeq2SeqLM
+    export_dir = os.path.join(ONNX_CACHE_DIR, model_name.replace('/', '--'))
+    if os.path.exists(os.path.join(export_dir, "config.json")):
+        model = model_class.from_pretrained(export_dir)
+        tokenizer = AutoTokenizer.from_pretrained(export_dir)
+    else:
+        logger.info("📦 Exporting %s to ONNX (first run only)...", model_name)
+        model = model_class.from_pretrained(model_name, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model.save_pretrained(export_dir)
+        tokenizer.save_pretrained(export_dir)
+    return pipeline(task, model=model, tokenizer=tokenizer)
+
+_LOADERS = {
+    "torch": _load_torch,
+    "torch-int8": _load_torch_int8,
+    "onnx": _load_onnx,
+}
+
+# Function to load a transformers pipeline on the selected backend
+def load_pipeline(task, model_name, backend=DEFAULT_BACKEND):
+    if backend not in _LOADERS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+    return _LOADERS[backend](task, model_name)
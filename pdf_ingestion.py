@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from instrumentation import record_cache
+
+# Upload limits
+MAX_PDF_BYTES = int(float(os.environ.get("SMART_ARTICLE_MAX_PDF_MB", "50")) * 1024 * 1024)
+MAX_PDF_PAGES = int(os.environ.get("SMART_ARTICLE_MAX_PDF_PAGES", "500"))
+# Pages extracted per worker task; smaller documents are extracted in-process
+PAGES_PER_TASK = 16
+PDF_WORKERS = int(os.environ.get("SMART_ARTICLE_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_TEXT_CACHE_DIR = os.environ.get("SMART_ARTICLE_PDF_CACHE", os.path.join(".cache", "pdf_text"))
+# Extracted documents kept in memory
+MEMORY_CACHE_FILES = 16
+
+_executor = None
+_executor_lock = threading.Lock()
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+class PdfTooLargeError(ValueError):
+    pass
+
+
+# Function to hash an uploaded file
+def file_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _cache_path(digest, cache_dir):
+    return os.path.join(cache_dir, f"{digest}.json")
+
+# Function to look up the extracted pages of a file, in memory first and then on disk
+def get_cached_pages(digest, cache_dir=PDF_TEXT_CACHE_DIR):
+    with _memory_lock:
+        pages = _memory_cache.get(digest)
+        if pages is not None:
+            _memory_cache.move_to_end(digest)
+            return pages
+    if not cache_dir:
+        return None
+    try:
+        with open(_cache_path(digest, cache_dir), encoding="utf-8") as f:
+            pages = json.load(f)["pages"]
+    except (OSError, ValueError, KeyError):
+        return None
+    _remember(digest, pages)
+    return pages
+
+def _remember(digest, pages):
+    with _memory_lock:
+        _memory_cache[digest] = pages
+        _memory_cache.move_to_end(digest)
+        while len(_memory_cache) > MEMORY_CACHE_FILES:
+            _memory_cache.popitem(last=False)
+
+# Function to store extracted pages in memory and on disk
+def store_pages(digest, pages, cache_dir=PDF_TEXT_CACHE_DIR):
+    _remember(digest, pages)
+    if not cache_dir:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(digest, cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"pages": pages}, f)
+    os.replace(tmp_path, path)
+
+# Function to extract the text of pages [start, stop) of a PDF file; runs in worker processes
+def extract_page_range(path, start, stop):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers only import PyPDF2, never the models loaded in this process
+            _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+# Function to stream the page texts of a PDF in order, extracting page ranges in parallel
+def iter_pdf_pages(data, max_pages=MAX_PDF_PAGES, max_bytes=MAX_PDF_BYTES, cache_dir=PDF_TEXT_CACHE_DIR):
+    """Yield the text of each page of the PDF in `data` (bytes).
+
+    Cached files are served without parsing. Otherwise pages are extracted in ranges of
+    PAGES_PER_TASK by a process pool and yielded as soon as the next range in order is
+    done, so the caller can start working on the first pages of a long document. The
+    full result is cached by file hash once every page has been read.
+    """
+    if len(data) > max_bytes:
+        raise PdfTooLargeError(f"PDF is {len(data) / 1048576:.1f} MB; the limit is {max_bytes / 1048576:.0f} MB.")
+    digest = file_hash(data)
+    pages = get_cached_pages(digest, cache_dir)
+    record_cache("pdf_text", pages is not None)
+    if pages is not None:
+        logger.info("⚡ Using cached text for PDF", extra={"pages": len(pages)})
+        yield from pages
+        return
+
+    from io import BytesIO
+    from PyPDF2 import PdfReader
+    reader = PdfReader(BytesIO(data))
+    page_count = len(reader.pages)
+    if page_count > max_pages:
+        raise PdfTooLargeError(f"PDF has {page_count} pages; the limit is {max_pages}.")
+
+    pages = []
+    if page_count <= PAGES_PER_TASK or PDF_WORKERS <= 1:
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            pages.append(text)
+            yield text
+        store_pages(digest, pages, cache_dir)
+        return
+
+    # Workers read the document from a file rather than receiving a copy of it with every task
+    folder = os.path.abspath(cache_dir or ".")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{digest}.{os.getpid()}.{threading.get_ident()}.pdf")
+    with open(path, "wb") as f:
+        f.write(data)
+    executor = _get_executor()
+    futures = [executor.submit(extract_page_range, path, start, min(start + PAGES_PER_TASK, page_count))
+               for start in range(0, page_count, PAGES_PER_TASK)]
+    try:
+        for future in futures:
+            for text in future.result():
+                pages.append(text)
+                yield text
+        store_pages(digest, pages, cache_dir)
+    finally:
+        # Stop outstanding work if the caller gave up early
+        for future in futures:
+            future.cancel()
+        for future in futures:
+            if not future.cancelled():
+                try:
+                    future.exception()
+                except Exception:
+                    pass
+        os.remove(path)
+
+# Function to extract the whole text of a PDF
+def extract_pdf_text(data, **limits):
+    return "\n".join(iter_pdf_pages(data, **limits))
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from fpdf import FPDF
+from instrumentation import STAGE_BYTES, record_cache, stage
+from text_cleaning import PDF_PASSES, TITLE_PASSES, clean_text
+
+# Rendered PDF bytes kept in memory, in MB
+PDF_CACHE_MB = float(os.environ.get("SMART_ARTICLE_PDF_CACHE_MB", "64"))
+# Threads writing PDFs to disk in the background
+PERSIST_WORKERS = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+class PdfCache:
+    """LRU of rendered PDF bytes, bounded by total size"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self.entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self.entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+pdf_cache = PdfCache(int(PDF_CACHE_MB * 1024 * 1024))
+
+# Function to hash the inputs that determine a PDF's content
+def content_key(title, text, is_summary=False):
+    digest = hashlib.sha256()
+    for part in ("summary" if is_summary else "article", title or "", text or ""):
+        digest.update(part.encode("utf-8", "surrogatepass"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+# Function to lay out a document with FPDF and return its bytes
+def render_pdf(title, text, is_summary=False):
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    # Header
+    pdf.set_font("Arial", 'B', 16)
+    header_text = "Article Summary" if is_summary else "Article"
+    pdf.cell(200, 10, txt=header_text, ln=True, align='C')
+    pdf.ln(5)
+    pdf.set_font("Arial", size=10)
+    pdf.cell(200, 10, txt=f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True, align='L')
+    pdf.ln(10)
+
+    # Title
+    pdf.set_font("Arial", 'B', 14)
+    pdf.multi_cell(0, 10, txt=clean_text(title, TITLE_PASSES))
+    pdf.ln(5)
+
+    # Content
+    pdf.set_font("Arial", size=12)
+    pdf.multi_cell(0, 10, txt=clean_text(text, PDF_PASSES))
+
+    # FPDF 1.x returns a latin-1 str, fpdf2 a bytearray
+    data = pdf.output(dest='S')
+    if isinstance(data, str):
+        data = data.encode('latin-1')
+    return bytes(data)
+
+# Function to write bytes to a file without leaving a partial file behind
+def write_atomic(path, data):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PERSIST_WORKERS, thread_name_prefix="pdf-persist")
+        return _executor
+
+# Function to wait until all background PDF writes have finished
+def wait_for_pending(timeout=None):
+    for future in list(_pending):
+        future.result(timeout=timeout)
+
+
+class LazyPdf:
+    """A PDF that is only laid out when its bytes are needed.
+
+    Rendered bytes are shared through pdf_cache, so the same title and text render
+    once however many times they are downloaded or saved.
+    """
+
+    def __init__(self, title, text, filename, folder=None, is_summary=False):
+        self.title = title
+        self.text = text
+        self.is_summary = is_summary
+        self.key = content_key(title, text, is_summary)
+        self.filename = filename
+        self.path = os.path.join(folder, filename) if folder else None
+        self._lock = threading.Lock()
+
+    def bytes(self):
+        data = pdf_cache.get(self.key)
+        if data is not None:
+            record_cache("pdf", True)
+            return data
+        with self._lock:
+            data = pdf_cache.get(self.key)
+            record_cache("pdf", data is not None)
+            if data is None:
+                with stage("pdf_render"):
+                    data = render_pdf(self.title, self.text, self.is_summary)
+                STAGE_BYTES.inc(len(data), stage="pdf_render")
+                pdf_cache.put(self.key, data)
+        return data
+
+    def save(self):
+        """Render if needed and write to self.path; returns the path"""
+        return write_atomic(self.path, self.bytes())
+
+    def persist(self):
+        """Save in a background thread; returns a Future resolving to the path"""
+        future = _get_executor().submit(self.save)
+        _pending.add(future)
+        future.add_done_callback(_pending.discard)
+        return future
+
+    def __repr__(self):
+        return f"LazyPdf({self.filename!r})"
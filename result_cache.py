@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from instrumentation import record_cache
+
+# On-disk location and size bound of the result cache
+DEFAULT_CACHE_PATH = os.environ.get("SMART_ARTICLE_CACHE_PATH", os.path.join(".cache", "results.sqlite3"))
+DEFAULT_MAX_BYTES = int(os.environ.get("SMART_ARTICLE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Function to fingerprint cleaned article text
+def text_fingerprint(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+# Function to build a cache key from a result kind, text fingerprint and the parameters that shape the result
+def cache_key(kind, fingerprint, **params):
+    payload = json.dumps(params, sort_keys=True, separators=(',', ':'))
+    return f"{kind}:{hashlib.sha256(f'{fingerprint}|{payload}'.encode('utf-8')).hexdigest()}"
+
+
+class ResultCache:
+    """Persistent, size-bounded LRU cache of JSON-serialisable model results"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used)")
+        self._conn.commit()
+
+    def get(self, key):
+        kind = key.split(':', 1)[0]
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+                record_cache(kind, False)
+                return None
+            self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+        record_cache(kind, True)
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        data = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        while total > self.max_bytes:
+            row = self._conn.execute("SELECT key, size FROM results ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM results WHERE key = ?", (row[0],))
+            total -= row[1]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+        }
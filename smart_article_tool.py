@@ -1,217 +1,879 @@
 import os
+import json
+import time
+import logging
+import hashlib
+import functools
+import threading
 import requests
 from datetime import datetime
+from urllib.parse import urlparse
 from bs4 import BeautifulSoup
-from fpdf import FPDF
 import re
-import spacy
 from heapq import nlargest
-import unicodedata
+from chunker import chunk_text, iter_chunks
+from pdf_rendering import LazyPdf, content_key, wait_for_pending
+from html_extraction import extract_html
+from hierarchical_summary import HIERARCHY_LEVELS, HIERARCHY_MIN_CHUNKS, HIERARCHY_MODE, HierarchicalReducer, use_hierarchy
+from text_cleaning import PDF_PASSES, CleanedText, clean_text
+from result_cache import ResultCache, cache_key, text_fingerprint
+from dedup_index import DedupIndex
+from article_store import ArticleStore
+from classification import classify_text
+from cascade_classifier import CascadeClassifier, DEFAULT_THRESHOLD
+from model_backends import BACKENDS, DEFAULT_BACKEND, load_pipeline
+from instrumentation import (ANALYSES, MODEL_BATCH_SIZE, STAGE_BYTES, STAGE_TOKENS, configure_logging, profiled,
+                             record_cache, stage)
+
+logger = logging.getLogger(__name__)
 
 # Initialize pipelines lazily
 classifier = None
 summarizer = None
+nlp = None
+summary_tokenizer = None
+result_cache = None
+cascade = None
+inference_client = None
+dedup_index = None
+article_store = None
+_model_lock = threading.RLock()
+# Seconds spent loading and warming up each component
+MODEL_LOAD_TIMINGS = {}
+
+# Models used for classification and summarization
+CLASSIFIER_MODEL = "facebook/bart-large-mnli"
+SUMMARIZER_MODEL = "google/pegasus-xsum"
+SPACY_MODEL = "en_core_web_sm"
+# Inference backend for both pipelines: "torch", "torch-int8" or "onnx"
+MODEL_BACKEND = DEFAULT_BACKEND
+# Set SMART_ARTICLE_CACHE=0 to always re-run the models
+CACHE_ENABLED = os.environ.get("SMART_ARTICLE_CACHE", "1") != "0"
+# Reuse the results of near-duplicate articles (SMART_ARTICLE_DEDUP=0 disables)
+DEDUP_ENABLED = os.environ.get("SMART_ARTICLE_DEDUP", "1") != "0"
+# Record analyzed articles for search (SMART_ARTICLE_STORE=0 disables)
+STORE_ENABLED = os.environ.get("SMART_ARTICLE_STORE", "1") != "0"
+
+# Summarization settings
+SUMMARY_BATCH_SIZE = int(os.environ.get("SMART_ARTICLE_SUMMARY_BATCH_SIZE", "8"))
+SUMMARY_MIN_LENGTH = 30
+# Bumped when per-chunk summary budgets change, so summaries cached under older budgets are not reused
+CHUNK_BUDGET_VERSION = 2
+# How per-window label scores of long articles are combined: "mean", "max" or "length"
+CLASSIFY_REDUCER = os.environ.get("SMART_ARTICLE_CLASSIFY_REDUCER", "mean")
+# Address of a shared inference server (see inference_server.py); empty runs the models in-process
+INFERENCE_SERVER = os.environ.get("SMART_ARTICLE_INFERENCE_SERVER", "")
+# Skip the zero-shot model when the cheap first-stage classifier is this confident (SMART_ARTICLE_CASCADE=0 disables)
+CASCADE_ENABLED = os.environ.get("SMART_ARTICLE_CASCADE", "1") != "0"
+CASCADE_THRESHOLD = DEFAULT_THRESHOLD
+# Tokens of the previous chunk repeated at the start of the next one (0 disables overlap)
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("SMART_ARTICLE_CHUNK_OVERLAP_TOKENS", "0"))
+
+# HTTP fetch settings
+FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Referer": "https://www.google.com/"
+}
+FETCH_TIMEOUT = 15
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 0.5
+# Number of per-host connection pools kept alive, and connections per pool
+POOL_HOSTS = 32
+POOL_SIZE = 8
+HTTP_CACHE_DIR = os.environ.get("SMART_ARTICLE_HTTP_CACHE", os.path.join(".cache", "http"))
+# HTML extraction: "density" (single-pass scorer in html_extraction.py) or "legacy" (BeautifulSoup selectors)
+HTML_EXTRACTOR = os.environ.get("SMART_ARTICLE_EXTRACTOR", "density")
+PAYWALL_MESSAGE = "Login or paywall detected. Please upload the article content as a .txt or .pdf file."
+EXTRACTION_FAILED_MESSAGE = ("Unable to extract article content. The website (e.g., ResearchGate) may use JavaScript "
+                             "rendering or a unique structure. Try uploading the article as a .txt or .pdf file.")
+
+# Kinds of events yielded by iter_analyze_article, in the order they normally occur
+FETCHED = "fetched"
+EXTRACTED = "extracted"
+DUPLICATE = "duplicate"
+CLASSIFIED = "classified"
+CHUNK_SUMMARIZED = "chunk_summarized"
+RANKED = "ranked"
+RENDERED = "rendered"
+DONE = "done"
+ERROR = "error"
+
+
+class AnalysisEvent:
+    """One step of an analysis: `kind`, overall `progress` (0-1, None if unknown) and step data"""
+
+    def __init__(self, kind, progress=None, **data):
+        self.kind = kind
+        self.progress = progress
+        self.data = data
+
+    def __repr__(self):
+        return f"AnalysisEvent({self.kind!r}, progress={self.progress}, {sorted(self.data)})"
+
+# Function to load a component once, recording how long it took
+def _load_component(name, loader):
+    start = time.perf_counter()
+    component = loader()
+    MODEL_LOAD_TIMINGS[name] = round(time.perf_counter() - start, 3)
+    logger.info("⏱️ Loaded %s", name, extra={"component": name, "seconds": MODEL_LOAD_TIMINGS[name]})
+    return component
+
+# Function to get the zero-shot classification pipeline, loading it on first use
+def get_classifier():
+    global classifier
+    if classifier is None:
+        with _model_lock:
+            if classifier is None:
+                classifier = _load_component("classifier", lambda: load_pipeline("zero-shot-classification", CLASSIFIER_MODEL, MODEL_BACKEND))
+    return classifier
+
+# Function to get the summarization pipeline, loading it on first use
+def get_summarizer():
+    global summarizer
+    if summarizer is None:
+        with _model_lock:
+            if summarizer is None:
+                summarizer = _load_component("summarizer", lambda: load_pipeline("summarization", SUMMARIZER_MODEL, MODEL_BACKEND))
+    return summarizer
+
+# Function to get the spaCy model, loading it on first use
+def get_nlp():
+    global nlp
+    if nlp is None:
+        with _model_lock:
+            if nlp is None:
+                import spacy
+                nlp = _load_component("spacy", lambda: spacy.load(SPACY_MODEL))
+    return nlp
+
+# Function to get the summarizer's tokenizer without loading the model itself when possible
+def get_summary_tokenizer():
+    global summary_tokenizer
+    if summarizer is not None:
+        return summarizer.tokenizer
+    if summary_tokenizer is None:
+        with _model_lock:
+            if summary_tokenizer is None:
+                from transformers import AutoTokenizer
+                summary_tokenizer = AutoTokenizer.from_pretrained(SUMMARIZER_MODEL)
+    return summary_tokenizer
+
+# Function to get the client of the shared inference server (None when models run in-process)
+def get_inference_client():
+    global inference_client
+    if not INFERENCE_SERVER:
+        return None
+    if inference_client is None:
+        from inference_server import InferenceClient
+        inference_client = InferenceClient(INFERENCE_SERVER)
+    return inference_client
+
+# Function to load both pipelines, switching to another inference backend if one is given
+def initialize_models(backend=None):
+    global classifier, summarizer, MODEL_BACKEND
+    if backend and backend != MODEL_BACKEND:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+        # Pipelines built for the previous backend are dropped and reloaded
+        with _model_lock:
+            MODEL_BACKEND = backend
+            classifier = None
+            summarizer = None
+    get_classifier()
+    get_summarizer()
+
+# Function to load every model and run a dummy inference so the first request does not pay for it
+def preload_models(warmup=True):
+    """Load spaCy and both pipelines, optionally warm them up, and return per-component timings.
+
+    With a shared inference server configured, only spaCy is loaded in this process.
+    """
+    get_nlp()
+    if not INFERENCE_SERVER:
+        initialize_models()
+    if warmup:
+        sample = ("Researchers released a new artificial intelligence system that helps hospitals "
+                  "plan staff schedules. Early results suggest shorter waiting times for patients.")
+        start = time.perf_counter()
+        rank_sentences(sample, n=1)
+        MODEL_LOAD_TIMINGS["spacy_warmup"] = round(time.perf_counter() - start, 3)
+    if warmup and not INFERENCE_SERVER:
+        start = time.perf_counter()
+        classify_text(classifier, sample, ["Technology", "Business"])
+        MODEL_LOAD_TIMINGS["classifier_warmup"] = round(time.perf_counter() - start, 3)
+        start = time.perf_counter()
+        summarizer(sample, max_length=32, min_length=5, do_sample=False)
+        MODEL_LOAD_TIMINGS["summarizer_warmup"] = round(time.perf_counter() - start, 3)
+    logger.info("✅ Models ready", extra={"timings": dict(MODEL_LOAD_TIMINGS)})
+    return dict(MODEL_LOAD_TIMINGS)
+
+# Function to get the shared result cache (None when caching is disabled)
+def get_result_cache():
+    global result_cache
+    if result_cache is None and CACHE_ENABLED:
+        result_cache = ResultCache()
+    return result_cache
+
+# Function to get the near-duplicate index (None when disabled)
+def get_dedup_index():
+    global dedup_index
+    if dedup_index is None and DEDUP_ENABLED:
+        with _model_lock:
+            if dedup_index is None:
+                dedup_index = DedupIndex()
+    return dedup_index
+
+# Function to get the article store (None when disabled)
+def get_article_store():
+    global article_store
+    if article_store is None and STORE_ENABLED:
+        with _model_lock:
+            if article_store is None:
+                article_store = ArticleStore()
+    return article_store
+
+# Function to get the classification cascade for a label set (None when disabled or for other labels)
+def get_cascade(labels):
+    global cascade
+    if not CASCADE_ENABLED:
+        return None
+    with _model_lock:
+        if cascade is None:
+            cascade = CascadeClassifier(labels, threshold=CASCADE_THRESHOLD)
+    return cascade if cascade.labels == list(labels) else None
+
+# Function to parse per-host rate limits, e.g. "example.com=1.5,*=0.2" (minimum seconds between requests)
+def parse_rate_limits(spec):
+    limits = {}
+    for item in spec.split(','):
+        if '=' in item:
+            host, interval = item.split('=', 1)
+            limits[host.strip().lower()] = float(interval)
+    return limits
+
+HOST_RATE_LIMITS = parse_rate_limits(os.environ.get("SMART_ARTICLE_HOST_RATE_LIMITS", ""))
 
-def initialize_models():
-    global classifier, summarizer
-    if classifier is None or summarizer is None:
-        from transformers import pipeline
-        classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-        summarizer = pipeline("summarization", model="google/pegasus-xsum")
+http_session = None
+_session_lock = threading.Lock()
+_rate_lock = threading.Lock()
+_host_next_request = {}
 
-# Load spaCy model for NLP tasks
-nlp = spacy.load('en_core_web_sm')
+# Function to advertise only the content encodings urllib3 can decode here
+def accept_encoding():
+    try:
+        import brotli  # noqa: F401
+        return "gzip, deflate, br"
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            return "gzip, deflate, br"
+        except ImportError:
+            return "gzip, deflate"
+
+# Function to build a session with pooled connections and retry on transient errors
+def create_http_session(retries=FETCH_RETRIES, backoff=FETCH_BACKOFF):
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(FETCH_HEADERS)
+    session.headers["Accept-Encoding"] = accept_encoding()
+    return session
+
+# Function to get the shared HTTP session
+def get_http_session():
+    global http_session
+    with _session_lock:
+        if http_session is None:
+            http_session = create_http_session()
+    return http_session
+
+# Function to wait until the host's rate limit allows another request
+def wait_for_host(host):
+    interval = HOST_RATE_LIMITS.get(host, HOST_RATE_LIMITS.get('*', 0))
+    if interval <= 0:
+        return
+    with _rate_lock:
+        now = time.monotonic()
+        slot = max(now, _host_next_request.get(host, 0))
+        _host_next_request[host] = slot + interval
+    if slot > now:
+        time.sleep(slot - now)
+
+# Function to locate the cached copy of a URL
+def _http_cache_paths(url, cache_dir):
+    digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.json"), os.path.join(cache_dir, f"{digest}.html")
+
+# Function to load a cached response's validators and body
+def load_cached_response(url, cache_dir=HTTP_CACHE_DIR):
+    if not cache_dir:
+        return None
+    meta_path, body_path = _http_cache_paths(url, cache_dir)
+    try:
+        with open(meta_path, encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+        with open(body_path, encoding='utf-8') as body_file:
+            meta['body'] = body_file.read()
+        return meta
+    except (OSError, ValueError):
+        return None
+
+# Function to store a response that carries ETag/Last-Modified validators
+def store_cached_response(url, body, etag=None, last_modified=None, cache_dir=HTTP_CACHE_DIR):
+    if not cache_dir or not (etag or last_modified):
+        return
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+    meta_path, body_path = _http_cache_paths(url, cache_dir)
+    # Write to temporary files first so concurrent readers never see half a page
+    for path, data in ((body_path, body), (meta_path, json.dumps({"url": url, "etag": etag, "last_modified": last_modified}))):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+
+# Function to fetch a page, revalidating any cached copy with a conditional request
+def fetch_url(url, timeout=FETCH_TIMEOUT, session=None, cache_dir=HTTP_CACHE_DIR):
+    """Return the page text; raises requests.exceptions.HTTPError for error statuses"""
+    session = session or get_http_session()
+    cached = load_cached_response(url, cache_dir)
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+    wait_for_host(urlparse(url).netloc.lower())
+    response = session.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and cached:
+        logger.info("♻️ Page not modified, using cached copy", extra={"url": url})
+        record_cache("http", True)
+        return cached['body']
+    record_cache("http", False)
+    response.raise_for_status()
+    response.encoding = 'utf-8'
+    body = response.text
+    store_cached_response(url, body, response.headers.get('ETag'), response.headers.get('Last-Modified'), cache_dir)
+    return body
 
 # Function to sanitize the filename
 def sanitize_filename(filename):
     return re.sub(r'[<>:"/\\|?*]', '_', filename)
 
+# Function to name a PDF after its content hash, optionally prefixed with a timestamp
+def pdf_filename(prefix, key, timestamp=None):
+    stamp = f"_{timestamp}" if timestamp else ""
+    return sanitize_filename(f"{prefix}{stamp}_{key[:10]}.pdf")
+
 # Function to clean text for PDF compatibility
 def clean_text_for_pdf(text):
     """Aggressively clean text to remove all non-ASCII characters and boilerplate"""
-    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
-    text = re.sub(
-        r'(Advertisement|Sponsored|Subscribe Now|Sign Up|Log In|Follow Us|Share This|Related Posts|'
-        r'Footer|Nav|Menu|Sidebar|Comment|Social Media|Home|About|Contact|Privacy Policy|'
-        r'Terms of Use|Terms and Conditions|Login to view|BBC News|Published by|Journal of|'
-        r'Copyright|All rights reserved|Posted on|Updated on|Share on|Read more|'
-        r'Newsletter|Membership|Cookies|Accept|Decline|View Full Text).*?(?=\n|$)', 
-        '', text, flags=re.IGNORECASE
-    )
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    return clean_text(text, PDF_PASSES)
 
 # Function to save text as PDF with improved formatting
 def save_text_as_pdf(filename, title, text, folder, is_summary=False):
-    if not os.path.exists(folder):
-        os.makedirs(folder)
-    filename = sanitize_filename(filename)
-    file_path = os.path.join(folder, filename)
-    if os.path.exists(file_path):
-        print(f"⚠️ File already exists: {file_path}")
-        return file_path
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    
-    # Header
-    pdf.set_font("Arial", 'B', 16)
-    header_text = "Article Summary" if is_summary else "Article"
-    pdf.cell(200, 10, txt=header_text, ln=True, align='C')
-    pdf.ln(5)
-    pdf.set_font("Arial", size=10)
-    pdf.cell(200, 10, txt=f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True, align='L')
-    pdf.ln(10)
-    
-    # Title
-    pdf.set_font("Arial", 'B', 14)
-    cleaned_title = clean_text_for_pdf(title)
-    cleaned_title = re.sub(r'\bbioethic\b', 'bioethics', cleaned_title, flags=re.IGNORECASE)
-    pdf.multi_cell(0, 10, txt=cleaned_title)
-    pdf.ln(5)
-    
-    # Content
-    pdf.set_font("Arial", size=12)
-    cleaned_text = clean_text_for_pdf(text)
-    pdf.multi_cell(0, 10, txt=cleaned_text)
-    
-    pdf.output(file_path)
-    print(f"Saved PDF: {file_path}")
+    """Render (or reuse the cached render of) a PDF and write it to folder/filename"""
+    pdf = LazyPdf(title, text, sanitize_filename(filename), folder, is_summary)
+    file_path = pdf.save()
+    logger.info("Saved PDF", extra={"path": file_path})
     return file_path
 
+# spaCy components that summary post-processing does not need
+RANKING_DISABLED_COMPONENTS = ["ner", "lemmatizer"]
+# Compiled keyword matchers, keyed by keyword list
+_keyword_matchers = {}
+
 # Function to rank sentences for summary
 def rank_sentences(text, n=5):
-    doc = nlp(text)
-    sentences = [sent.text.strip() for sent in doc.sents]
+    doc = next(get_nlp().pipe([text], disable=RANKING_DISABLED_COMPONENTS))
     sentence_scores = {}
-    for sent in sentences:
-        doc_sent = nlp(sent)
-        score = sum(token.rank for token in doc_sent if token.rank) / (len(doc_sent) + 1)
-        sentence_scores[sent] = score
+    for sent in doc.sents:
+        tokens = [token for token in sent if not token.is_space]
+        if not tokens:
+            continue
+        score = sum(token.rank for token in tokens if token.rank) / (len(tokens) + 1)
+        sentence_scores[sent.text.strip()] = score
     return nlargest(n, sentence_scores, key=sentence_scores.get)
 
+# Function to get a case-insensitive phrase matcher for keywords
+def get_keyword_matcher(keywords):
+    key = tuple(keywords)
+    matcher = _keyword_matchers.get(key)
+    if matcher is None:
+        from spacy.matcher import PhraseMatcher
+        nlp = get_nlp()
+        matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+        matcher.add("KEYWORDS", list(nlp.tokenizer.pipe(keywords)))
+        _keyword_matchers[key] = matcher
+    return matcher
+
 # Function to filter irrelevant summary sentences
 def filter_relevant_sentences(sentences, keywords):
-    relevant_sentences = []
-    for sent in sentences:
-        doc = nlp(sent.lower())
-        if any(keyword in [token.text for token in doc] for keyword in keywords):
-            relevant_sentences.append(sent)
+    matcher = get_keyword_matcher(keywords)
+    # Keyword matching only needs tokens, so the tagger and parser are skipped entirely
+    tokenizer = get_nlp().tokenizer
+    relevant_sentences = [sent for sent, doc in zip(sentences, tokenizer.pipe(sentences)) if matcher(doc)]
     return relevant_sentences if relevant_sentences else sentences[:min(5, len(sentences))]
 
-# Function to analyze and save article
-def analyze_and_save_article(content, is_url=True):
+# Function to derive the summary length budget of a single chunk
+def chunk_max_length(chunk):
+    return max(50, int(0.5 * len(chunk.split())))
+
+# Function to cut a summary down to `max_length` tokens, at the last sentence end when there is one
+def cap_summary(tokenizer, summary, max_length):
+    ids = tokenizer(summary, add_special_tokens=False)["input_ids"]
+    if len(ids) <= max_length:
+        return summary
+    capped = tokenizer.decode(ids[:max_length], skip_special_tokens=True).strip()
+    end = max(capped.rfind(mark) for mark in ".!?")
+    return capped[:end + 1] if end > 0 else capped
+
+# Function to summarize chunks in length-sorted batches
+def summarize_chunks(chunks, batch_size=SUMMARY_BATCH_SIZE, keep_failed=False, max_length=None, min_length=SUMMARY_MIN_LENGTH):
+    """Summarize chunks in batches and return the summaries in the original chunk order.
+
+    Chunks that fail are dropped, or left as None when `keep_failed` is set. Without
+    `max_length`, each chunk gets its own length budget: a batch is generated with the
+    largest budget in it, and each summary is then capped to its chunk's budget.
+    """
+    summarizer = get_summarizer()
+    summaries = [None] * len(chunks)
+    budgets = [max_length or chunk_max_length(chunk) for chunk in chunks]
+    # Longest first, so every batch holds chunks of similar length and little padding
+    order = sorted(range(len(chunks)), key=lambda i: len(chunks[i]), reverse=True)
+    for start in range(0, len(order), max(1, batch_size)):
+        batch = order[start:start + max(1, batch_size)]
+        batch_chunks = [chunks[i] for i in batch]
+        MODEL_BATCH_SIZE.observe(len(batch_chunks), model="summarizer")
+        try:
+            results = summarizer(batch_chunks, max_length=max(budgets[i] for i in batch), min_length=min_length,
+                                 do_sample=False, truncation=True, batch_size=len(batch_chunks))
+            for i, result in zip(batch, results):
+                summaries[i] = cap_summary(summarizer.tokenizer, result['summary_text'], budgets[i])
+        except Exception as e:
+            logger.warning("⚠️ Error summarizing batch, retrying chunks one by one: %s", e, extra={"batch_size": len(batch)})
+            for i in batch:
+                try:
+                    result = summarizer(chunks[i], max_length=budgets[i],
+                                        min_length=min_length, do_sample=False, truncation=True)
+                    summaries[i] = result[0]['summary_text']
+                except Exception as e:
+                    logger.warning("⚠️ Error summarizing chunk: %s", e)
+    if keep_failed:
+        return summaries
+    return [summary for summary in summaries if summary is not None]
+
+# Function to summarize chunks a batch at a time, yielding an event as each batch finishes
+def iter_chunk_summaries(chunks, total=None, progress_range=(0.4, 0.9), timings=None):
+    """`chunks` may be a lazy iterable; `total` (when known) is used for progress reporting.
+
+    Only the model calls are added to `timings`, not the time the consumer spends on each event.
+    """
+    client = get_inference_client()
+    summarize = client.summarize if client else summarize_chunks
+    low, high = progress_range
+    index, batch = 0, []
+
+    def finish(batch):
+        nonlocal index
+        with stage("summarize_chunk", timings):
+            summaries = summarize(batch)
+        for summary in summaries:
+            index += 1
+            progress = low + (high - low) * index / total if total else None
+            yield AnalysisEvent(CHUNK_SUMMARIZED, progress, index=index, total=total, summary=summary)
+
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == SUMMARY_BATCH_SIZE:
+            yield from finish(batch)
+            batch = []
+    if batch:
+        yield from finish(batch)
+
+# Function to re-summarize grouped summaries for the hierarchical reducer
+def summarize_groups(texts, max_length, min_length, timings=None):
+    client = get_inference_client()
+    with stage("summarize_reduce", timings):
+        if client:
+            return client.summarize(texts, max_length=max_length, min_length=min_length)
+        return summarize_chunks(texts, max_length=max_length, min_length=min_length)
+
+# Function to pass chunk events through, collecting their summaries
+def gather_chunk_summaries(chunk_events, timings=None):
+    """Yield every event from `chunk_events` and return the summaries to rank.
+
+    Once the number of chunk summaries reaches the hierarchy threshold, they are fed
+    into a HierarchicalReducer instead of being kept, so long inputs end up with a
+    few top-level summaries and memory stays bounded.
+    """
+    summary_parts, reducer = [], None
+    for event in chunk_events:
+        yield event
+        if reducer is not None:
+            reducer.add(event.data["summary"])
+            continue
+        summary_parts.append(event.data["summary"])
+        if use_hierarchy(len(summary_parts)):
+            reducer = HierarchicalReducer(functools.partial(summarize_groups, timings=timings), get_summary_tokenizer())
+            reducer.extend(summary_parts)
+            summary_parts = None
+    if reducer is None:
+        return summary_parts
+    summary_parts = reducer.finish()
+    for level in reducer.stats():
+        logger.info("🪜 Reduced summary level %s", level['level'], extra=level)
+    return summary_parts
+
+# Function to clean streamed pages, keeping the cleaned text
+def _clean_pages(pages, cleaned_pages):
+    for page in pages:
+        STAGE_BYTES.inc(len(page), stage="pdf_pages")
+        with stage("clean"):
+            page = clean_text_for_pdf(page)
+        if page:
+            cleaned_pages.append(page)
+            yield page
+
+# Function to extract the title and article text from a downloaded page
+def extract_article(html):
+    """Return (title, text, error) for an HTML page"""
+    if HTML_EXTRACTOR == "legacy":
+        return extract_article_with_soup(html)
+    result = extract_html(html)
+    title = clean_text(result.title, ("bioethics",))
+    if result.error == "paywall":
+        logger.warning("⚠️ Login or paywall detected.")
+        return None, None, PAYWALL_MESSAGE
+    if result.error:
+        logger.warning("⚠️ Could not find article content", extra={"characters": len(result.text)})
+        return None, None, EXTRACTION_FAILED_MESSAGE
+    logger.info("📄 Extracted article", extra={"characters": len(result.text)})
+    return title, result.text, None
+
+# Function to extract an article with the previous BeautifulSoup selector chain
+def extract_article_with_soup(html):
+    """Return (title, text, error) for an HTML page; kept for comparison and as a fallback"""
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.string.strip() if soup.title else "Untitled"
+    title = clean_text(title, ("bioethics",))
+
+    login_indicators = ['login', 'sign in', 'register', 'access restricted', 'log in to view']
+    if any(indicator in soup.text.lower() for indicator in login_indicators):
+        logger.warning("⚠️ Login or paywall detected.")
+        return None, None, PAYWALL_MESSAGE
+
+    article_content = (
+        soup.find('article') or
+        soup.find('div', class_=re.compile('article|content|post|body|entry|story|text|single|page|main-content|post-content|entry-content|article-text|article-body|publication-abstract|nova-e-text', re.I)) or
+        soup.find('section', class_=re.compile('article|content|post|body|abstract', re.I)) or
+        soup.find('main') or
+        soup.find('div', attrs={'role': 'article'}) or
+        soup.find('div', class_=re.compile('wp-block-post-content|has-post-content|researchgate', re.I))
+    )
+
+    if not article_content:
+        logger.info("⚠️ Primary selectors failed. Attempting fallback to paragraph tags.")
+        paragraphs = soup.find_all('p')
+        text = ' '.join(p.get_text().strip() for p in paragraphs if p.get_text().strip())
+
+        if not text or len(text) < 100:
+            logger.info("⚠️ Paragraph fallback failed. Attempting body extraction.")
+            for unwanted in soup(['script', 'style', 'nav', 'footer', 'header', 'aside']):
+                unwanted.decompose()
+            body = soup.find('body')
+            text = body.get_text(separator=' ', strip=True) if body else ''
+
+        if not text or len(text) < 100:
+            logger.warning("⚠️ All extraction methods failed", extra={"characters": len(text or "")})
+            return None, None, EXTRACTION_FAILED_MESSAGE
+    else:
+        text = article_content.get_text(separator=' ', strip=True)
+        logger.info("📄 Extracted article", extra={"characters": len(text)})
+    return title, text, None
+
+# Function to clean, classify, summarize and save article text, reporting each step as it happens
+@profiled("process_article")
+def iter_process_article(title, text, is_url=True, save_pdfs=True, source_url=None, timings=None, file_hash=None):
+    """Yield AnalysisEvents for an article, ending with a DONE or ERROR event.
+
+    `text` is a string, or an iterable of page texts that are chunked and summarized as they
+    stream in (classification then follows once the last page has arrived). When the stream
+    comes from a file whose `file_hash` was analyzed before, its pages are only read and the
+    cached results are used instead.
+    Finished articles are recorded in the article store with per-stage `timings` in seconds.
+    """
+    timings = dict(timings or {})
+    started = time.perf_counter()
     try:
-        if is_url:
-            print(f"📥 Downloading article from URL: {content}")
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                "Accept-Language": "en-US,en;q=0.5",
-                "Referer": "https://www.google.com/"
-            }
-            try:
-                response = requests.get(content, headers=headers, timeout=15)
-                response.raise_for_status()
-            except requests.exceptions.HTTPError as http_err:
-                if response.status_code == 403:
-                    print(f"❌ Access denied (403 Forbidden) for URL: {content}")
-                    return None, None, None, None, None, None, "403 Forbidden: Access denied. This site (e.g., ResearchGate) may require login. Please upload the article as a .txt or .pdf file."
-                raise
-            response.encoding = 'utf-8'
-            soup = BeautifulSoup(response.text, 'html.parser')
-            title = soup.title.string.strip() if soup.title else "Untitled"
-            title = re.sub(r'\bbioethic\b', 'bioethics', title, flags=re.IGNORECASE)
-            
-            login_indicators = ['login', 'sign in', 'register', 'access restricted', 'log in to view']
-            if any(indicator in soup.text.lower() for indicator in login_indicators):
-                print("⚠️ Login or paywall detected.")
-                return None, None, None, None, None, None, "Login or paywall detected. Please upload the article content as a .txt or .pdf file."
-            
-            article_content = (
-                soup.find('article') or
-                soup.find('div', class_=re.compile('article|content|post|body|entry|story|text|single|page|main-content|post-content|entry-content|article-text|article-body|publication-abstract|nova-e-text', re.I)) or
-                soup.find('section', class_=re.compile('article|content|post|body|abstract', re.I)) or
-                soup.find('main') or
-                soup.find('div', attrs={'role': 'article'}) or
-                soup.find('div', class_=re.compile('wp-block-post-content|has-post-content|researchgate', re.I))
-            )
-            
-            if not article_content:
-                print("⚠️ Primary selectors failed. Attempting fallback to paragraph tags.")
-                paragraphs = soup.find_all('p')
-                text = ' '.join(p.get_text().strip() for p in paragraphs if p.get_text().strip())
-                
-                if not text or len(text) < 100:
-                    print("⚠️ Paragraph fallback failed. Attempting body extraction.")
-                    for unwanted in soup(['script', 'style', 'nav', 'footer', 'header', 'aside']):
-                        unwanted.decompose()
-                    body = soup.find('body')
-                    text = body.get_text(separator=' ', strip=True) if body else ''
-                
-                if not text or len(text) < 100:
-                    print(f"⚠️ All extraction methods failed. Extracted text: {text}")
-                    return None, None, None, None, None, None, "Unable to extract article content. The website (e.g., ResearchGate) may use JavaScript rendering or a unique structure. Try uploading the article as a .txt or .pdf file."
+        streamed_parts, file_key = None, None
+        if not isinstance(text, str):
+            cache = get_result_cache()
+            # The text fingerprint is only known after the last page, so analyzed files are looked up by hash
+            file_key = cache_key("file_fingerprint", file_hash) if cache and file_hash else None
+            cleaned_pages = []
+            if file_key and cache.get(file_key) is not None:
+                logger.info("⚡ File analyzed before, reading its pages without summarizing")
+                with stage("read_pages", timings):
+                    for _ in _clean_pages(text, cleaned_pages):
+                        pass
             else:
-                text = article_content.get_text(separator=' ', strip=True)
-                print(f"📄 Extracted text: {text}")
-            
-        else:
-            text = content
-            title = "Uploaded_Article"
-            title = re.sub(r'\bbioethic\b', 'bioethics', title, flags=re.IGNORECASE)
-
-        text = clean_text_for_pdf(text)
+                logger.info("📝 Summarizing pages as they are extracted...")
+                chunk_stats = {}
+                with stage("stream_summarize", timings):
+                    chunks = iter_chunks(_clean_pages(text, cleaned_pages), get_summary_tokenizer(), get_nlp(),
+                                         overlap_tokens=CHUNK_OVERLAP_TOKENS, stats=chunk_stats)
+                    streamed_parts = yield from gather_chunk_summaries(iter_chunk_summaries(chunks, timings=timings), timings)
+                STAGE_TOKENS.inc(chunk_stats.get('total_tokens', 0), stage="summarize")
+                logger.info("🧩 Summarized streamed pages", extra={"chunks": chunk_stats.get('chunk_count', 0),
+                                                                   "tokens": chunk_stats.get('total_tokens', 0)})
+            text = CleanedText(" ".join(cleaned_pages), PDF_PASSES)
+            yield AnalysisEvent(EXTRACTED, 0.8 if streamed_parts is not None else 0.25, title=title, text=text)
+        with stage("clean", timings):
+            text = clean_text_for_pdf(text)
         if not text or len(text) < 100:
-            print(f"⚠️ Article content is empty or too short: {text}")
-            return None, None, None, None, None, None, "Article content is empty or too short."
+            logger.warning("⚠️ Article content is empty or too short", extra={"characters": len(text or "")})
+            ANALYSES.inc(outcome="error")
+            yield AnalysisEvent(ERROR, 1.0, error="Article content is empty or too short.")
+            return
+        STAGE_BYTES.inc(len(text), stage="clean")
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        article_filename = f"article_{timestamp}.pdf" if is_url else "uploaded_article.pdf"
-        article_file_path = save_text_as_pdf(article_filename, title, text, "articles", is_summary=False)
+        # PDFs are rendered on first use; names carry a content hash so a stale file is never reused
+        article_key = content_key(title, text, is_summary=False)
+        article_filename = pdf_filename("article" if is_url else "uploaded_article", article_key, timestamp if is_url else None)
+        article_pdf = LazyPdf(title, text, article_filename, "articles", is_summary=False)
 
-        initialize_models()
+        cache = get_result_cache()
+        fingerprint = text_fingerprint(text)
 
-        print("🧠 Classifying article...")
         labels = ["Design", "Technology", "Business", "Marketing", "AI"]
-        classification = classifier(text, candidate_labels=labels)
+        classification_params = {
+            "model": CLASSIFIER_MODEL,
+            "backend": MODEL_BACKEND,
+            "labels": sorted(labels),
+            "reducer": CLASSIFY_REDUCER,
+            "cascade": CASCADE_THRESHOLD if CASCADE_ENABLED else None,
+        }
+        keywords = ['artificial intelligence', 'bioethics', 'society', 'medical', 'ethics', 'technology']
+        generation = {
+            "model": SUMMARIZER_MODEL,
+            "backend": MODEL_BACKEND,
+            "min_length": SUMMARY_MIN_LENGTH,
+            "overlap_tokens": CHUNK_OVERLAP_TOKENS,
+            "hierarchy": [HIERARCHY_MODE, HIERARCHY_MIN_CHUNKS, HIERARCHY_LEVELS],
+            "chunk_budget": CHUNK_BUDGET_VERSION,
+        }
+        classification_key = cache_key("classification", fingerprint, **classification_params)
+        chunk_summaries_key = cache_key("chunk_summaries", fingerprint, **generation)
+        summary_key = cache_key("summary", fingerprint, keywords=keywords, sentences=5, **generation)
+        classification = cache.get(classification_key) if cache else None
+        summary = cache.get(summary_key) if cache else None
+
+        # Near-duplicates of an article analyzed before (e.g. syndicated copies) reuse its results
+        dedup = get_dedup_index()
+        dedup_config = cache_key("dedup", "", classification=classification_params, keywords=keywords, **generation)
+        duplicate, signature = None, None
+        if dedup and (classification is None or summary is None):
+            with stage("dedup", timings):
+                signature = dedup.hasher.signature(text)
+                duplicate = dedup.query(text, dedup_config, signature)
+            record_cache("dedup", duplicate is not None)
+            if duplicate:
+                logger.info("♻️ Near-duplicate found, reusing its results",
+                            extra={"original": duplicate['result']['title'], "similarity": round(duplicate['similarity'], 3)})
+                yield AnalysisEvent(DUPLICATE, 0.4, similarity=duplicate["similarity"], title=duplicate["result"]["title"])
+                classification = classification or duplicate["result"]["classification"]
+                summary = summary or duplicate["result"]["summary"]
+
+        if classification is None:
+            logger.info("🧠 Classifying article...")
+            client = get_inference_client()
+            if client:
+                classify = lambda: client.classify(text, labels, reducer=CLASSIFY_REDUCER)
+            else:
+                classify = lambda: classify_text(get_classifier(), text, labels, reducer=CLASSIFY_REDUCER)
+            label_cascade = get_cascade(labels)
+            with stage("classify", timings):
+                classification = label_cascade.classify(text, classify, timings) if label_cascade else classify()
+            if classification.get('stage') == 'first_stage':
+                logger.info("⚡ First-stage classifier was confident, skipped zero-shot model",
+                            extra={"score": round(classification['scores'][0] * 100, 2)})
+            if cache:
+                cache.put(classification_key, classification)
+        elif not duplicate:
+            logger.info("⚡ Using cached classification")
         top_label = classification['labels'][0]
         score = round(classification['scores'][0] * 100, 2)
         display_label = "AI" if top_label.lower() == 'ai' else top_label.capitalize()
+        # Streamed pages are summarized before classification can start
+        yield AnalysisEvent(CLASSIFIED, 0.9 if streamed_parts is not None else 0.4, label=display_label, score=score, stage=classification.get('stage', 'nli'))
 
-        print("📝 Generating summary...")
-        chunks = [text[i:i+800] for i in range(0, len(text), 600)]
-        summary_parts = []
-        
-        for chunk in chunks:
-            try:
-                input_length = len(text.split())  # or use tokenizer.encode() for more precision
-                dynamic_max_length = max(50, int(0.5 * input_length))
-                result = summarizer(chunk, max_length=dynamic_max_length, min_length=30, do_sample=False)
-                summary_parts.append(result[0]['summary_text'])
-            except Exception as e:
-                print(f"⚠️ Error summarizing chunk: {e}")
-                continue
-        
-        summary_text = " ".join(summary_parts)
-        summary_sentences = rank_sentences(summary_text, n=5)
-        keywords = ['artificial intelligence', 'bioethics', 'society', 'medical', 'ethics', 'technology']
-        summary_sentences = filter_relevant_sentences(summary_sentences, keywords)
-        summary = " ".join(summary_sentences[:min(5, len(summary_sentences))])
+        if summary is None:
+            logger.info("📝 Generating summary...")
+            summary_parts = streamed_parts
+            if summary_parts is None and cache:
+                summary_parts = cache.get(chunk_summaries_key)
+            if summary_parts is None:
+                with stage("chunk", timings):
+                    chunks, chunk_stats = chunk_text(text, get_summary_tokenizer(), get_nlp(), overlap_tokens=CHUNK_OVERLAP_TOKENS)
+                STAGE_TOKENS.inc(chunk_stats['total_tokens'], stage="summarize")
+                logger.info("🧩 Split article into chunks", extra={"chunks": chunk_stats['chunk_count'],
+                                                                   "tokens": chunk_stats['total_tokens'],
+                                                                   "mean_tokens": chunk_stats['mean_tokens']})
+                summary_parts = yield from gather_chunk_summaries(
+                    iter_chunk_summaries(chunks, total=len(chunks), timings=timings), timings)
+                if cache:
+                    cache.put(chunk_summaries_key, summary_parts)
+            elif streamed_parts is not None and cache:
+                cache.put(chunk_summaries_key, summary_parts)
+
+            with stage("rank", timings):
+                summary_text = " ".join(summary_parts)
+                summary_sentences = rank_sentences(summary_text, n=5)
+                summary_sentences = filter_relevant_sentences(summary_sentences, keywords)
+                summary = " ".join(summary_sentences[:min(5, len(summary_sentences))])
+            if cache:
+                cache.put(summary_key, summary)
+        elif not duplicate:
+            logger.info("⚡ Using cached summary")
+        if file_key:
+            cache.put(file_key, fingerprint)
+        if dedup and not duplicate:
+            dedup.insert(text, fingerprint, {"title": title, "classification": classification, "summary": summary},
+                         dedup_config, signature)
+        yield AnalysisEvent(RANKED, 0.95, summary=summary)
 
-        summary_filename = f"summary_{timestamp}.pdf" if is_url else "uploaded_article_summary.pdf"
         summary_content = (
             f"Title: {title}\n\n"
             f"Category: {display_label} ({score} percent)\n\n"
             f"Summary:\n{summary}"
         )
-        summary_file_path = save_text_as_pdf(summary_filename, title, summary_content, "summaries", is_summary=True)
+        summary_pdf_key = content_key(title, summary_content, is_summary=True)
+        summary_filename = pdf_filename("summary" if is_url else "uploaded_article_summary", summary_pdf_key, timestamp if is_url else None)
+        summary_pdf = LazyPdf(title, summary_content, summary_filename, "summaries", is_summary=True)
+        if save_pdfs:
+            # Rendering and disk writes happen off the request path
+            article_pdf.persist()
+            summary_pdf.persist()
+            logger.info("✅ Saving PDFs", extra={"article_pdf": article_pdf.path, "summary_pdf": summary_pdf.path})
+        yield AnalysisEvent(RENDERED, 1.0, article_pdf=article_pdf, summary_pdf=summary_pdf)
+
+        timings["process"] = round(time.perf_counter() - started, 4)
+        store = get_article_store()
+        if store:
+            store.add({
+                "source_url": source_url,
+                "text_hash": fingerprint,
+                "title": title,
+                "label": display_label,
+                "score": score,
+                "label_scores": dict(zip(classification['labels'], classification['scores'])),
+                "summary": summary,
+                "text": text,
+                "timings": timings,
+                "article_pdf": article_pdf.path if save_pdfs else None,
+                "summary_pdf": summary_pdf.path if save_pdfs else None,
+                "duplicate_of": duplicate["fingerprint"] if duplicate else None,
+            })
 
-        print(f"\n✅ Saved original in 'articles/{article_filename}'")
-        print(f"✅ Saved summary in 'summaries/{summary_filename}'\n")
-        
-        return article_file_path, summary_file_path, text, summary, display_label, score, None
+        ANALYSES.inc(outcome="duplicate" if duplicate else "done")
+        logger.info("✅ Article analyzed", extra={"title": title, "label": display_label, "timings": timings})
+        yield AnalysisEvent(DONE, 1.0, result=(article_pdf, summary_pdf, text, summary, display_label, score, None),
+                            timings=timings)
 
     except Exception as e:
-        print(f"❌ Error: {e}")
-        return None, None, None, None, str(e)
\ No newline at end of file
+        logger.exception("❌ Error: %s", e)
+        ANALYSES.inc(outcome="error")
+        yield AnalysisEvent(ERROR, 1.0, error=str(e))
+
+# Function to fetch or take uploaded content and analyze it, reporting each step as it happens
+@profiled("analyze_article")
+def iter_analyze_article(content, is_url=True, save_pdfs=True, file_hash=None):
+    """Yield AnalysisEvents from download to rendered PDFs, ending with DONE or ERROR
+
+    `file_hash` identifies the uploaded file that streamed `content` pages came from.
+    """
+    timings = {}
+    try:
+        if is_url:
+            logger.info("📥 Downloading article", extra={"url": content})
+            try:
+                with stage("fetch", timings):
+                    html = fetch_url(content)
+            except requests.exceptions.HTTPError as http_err:
+                if http_err.response is not None and http_err.response.status_code == 403:
+                    logger.warning("❌ Access denied (403 Forbidden)", extra={"url": content})
+                    ANALYSES.inc(outcome="error")
+                    yield AnalysisEvent(ERROR, 1.0, error="403 Forbidden: Access denied. This site (e.g., ResearchGate) may require login. Please upload the article as a .txt or .pdf file.")
+                    return
+                raise
+            STAGE_BYTES.inc(len(html), stage="fetch")
+            yield AnalysisEvent(FETCHED, 0.15, url=content, size=len(html))
+            with stage("parse", timings):
+                title, text, error = extract_article(html)
+            if error:
+                ANALYSES.inc(outcome="error")
+                yield AnalysisEvent(ERROR, 1.0, error=error)
+                return
+            STAGE_BYTES.inc(len(text), stage="parse")
+            yield AnalysisEvent(EXTRACTED, 0.25, title=title, text=text)
+        else:
+            text = content
+            title = "Uploaded_Article"
+            title = clean_text(title, ("bioethics",))
+            if isinstance(text, str):
+                yield AnalysisEvent(EXTRACTED, 0.25, title=title, text=text)
+
+        yield from iter_process_article(title, text, is_url, save_pdfs, source_url=content if is_url else None,
+                                        timings=timings, file_hash=file_hash)
+
+    except Exception as e:
+        logger.exception("❌ Error: %s", e)
+        ANALYSES.inc(outcome="error")
+        yield AnalysisEvent(ERROR, 1.0, error=str(e))
+
+# Function to run an event stream to the end and return the classic result tuple
+def collect_result(events):
+    """Return (article_pdf, summary_pdf, text, summary, label, score, error)"""
+    for event in events:
+        if event.kind == DONE:
+            return event.data["result"]
+        if event.kind == ERROR:
+            return None, None, None, None, None, None, event.data["error"]
+    return None, None, None, None, None, None, "Analysis ended without a result."
+
+# Function to clean, classify, summarize and save article text
+def process_article(title, text, is_url=True, save_pdfs=True, source_url=None):
+    """`text` is a string, or an iterable of page texts that are summarized as they stream in"""
+    return collect_result(iter_process_article(title, text, is_url, save_pdfs, source_url))
+
+# Function to analyze and save article
+def analyze_and_save_article(content, is_url=True):
+    """Return (article_pdf_path, summary_pdf_path, text, summary, label, score, error) once the PDFs are on disk"""
+    article_pdf, summary_pdf, *rest = collect_result(iter_analyze_article(content, is_url))
+    if article_pdf is None:
+        return (None, None, *rest)
+    wait_for_pending()
+    return (article_pdf.path, summary_pdf.path, *rest)
+
+if __name__ == "__main__":
+    import sys
+    configure_logging()
+    if sys.argv[1:] == ["preload"]:
+        preload_models()
+    else:
+        print("Usage: python smart_article_tool.py preload")
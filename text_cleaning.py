@@ -0,0 +1,99 @@
+import re
+import unicodedata
+
+# Boilerplate phrases; a line is cut from the first phrase it contains to its end
+BOILERPLATE_PHRASES = [
+    "Advertisement", "Sponsored", "Subscribe Now", "Sign Up", "Log In", "Follow Us", "Share This", "Related Posts",
+    "Footer", "Nav", "Menu", "Sidebar", "Comment", "Social Media", "Home", "About", "Contact", "Privacy Policy",
+    "Terms of Use", "Terms and Conditions", "Login to view", "BBC News", "Published by", "Journal of",
+    "Copyright", "All rights reserved", "Posted on", "Updated on", "Share on", "Read more",
+    "Newsletter", "Membership", "Cookies", "Accept", "Decline", "View Full Text",
+]
+
+# Function to build a character trie from phrases
+def build_trie(phrases):
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase.lower():
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return trie
+
+# Function to turn a trie into a regex whose branches share prefixes
+def trie_to_pattern(node):
+    """Branches are only tried when their first character matches, so the regex
+    engine does a constant amount of work per input character."""
+    branches = [re.escape(char) + trie_to_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    if len(branches) == 1 and '' not in node:
+        return branches[0]
+    pattern = '(?:' + '|'.join(branches) + ')'
+    return pattern + '?' if '' in node else pattern
+
+# Compiled once at import; [^\n]* removes the rest of the line without the lazy look-ahead.
+# ASCII text is matched case-sensitively against its lowercased copy, which lets the regex
+# engine skip ahead on the first character; IGNORECASE is only needed for other text.
+_BOILERPLATE_PATTERN = '(?:' + trie_to_pattern(build_trie(BOILERPLATE_PHRASES)) + ')[^\n]*'
+BOILERPLATE_RE = re.compile(_BOILERPLATE_PATTERN)
+BOILERPLATE_IGNORECASE_RE = re.compile(_BOILERPLATE_PATTERN, re.IGNORECASE)
+BIOETHIC_RE = re.compile(r'\bbioethic\b', re.IGNORECASE)
+
+
+class CleanedText(str):
+    """A str that records which cleaning passes have already been applied to it"""
+
+    def __new__(cls, value, passes=()):
+        text = super().__new__(cls, value)
+        text.passes = frozenset(passes)
+        return text
+
+    def __reduce__(self):
+        return (CleanedText, (str(self), self.passes))
+
+# Function to fold text to ASCII
+def to_ascii(text):
+    if text.isascii():
+        return text
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+
+# Function to cut boilerplate lines
+def strip_boilerplate(text):
+    if not text.isascii():
+        return BOILERPLATE_IGNORECASE_RE.sub('', text)
+    pieces, last = [], 0
+    for match in BOILERPLATE_RE.finditer(text.lower()):
+        pieces.append(text[last:match.start()])
+        last = match.end()
+    pieces.append(text[last:])
+    return ''.join(pieces)
+
+# Function to collapse whitespace runs into single spaces
+def collapse_whitespace(text):
+    return ' '.join(text.split())
+
+# Function to fix the common 'bioethic' typo
+def fix_bioethics(text):
+    return BIOETHIC_RE.sub('bioethics', text)
+
+CLEANING_PASSES = {
+    "ascii": to_ascii,
+    "boilerplate": strip_boilerplate,
+    "whitespace": collapse_whitespace,
+    "bioethics": fix_bioethics,
+}
+# Passes applied to article text before PDF rendering and analysis
+PDF_PASSES = ("ascii", "boilerplate", "whitespace")
+# Passes applied to titles
+TITLE_PASSES = PDF_PASSES + ("bioethics",)
+
+# Function to apply cleaning passes, skipping those the text has already been through
+def clean_text(text, passes=PDF_PASSES):
+    applied = getattr(text, 'passes', frozenset())
+    pending = [name for name in passes if name not in applied]
+    if not pending and isinstance(text, CleanedText):
+        return text
+    for name in pending:
+        text = CLEANING_PASSES[name](text)
+    return CleanedText(text, applied.union(pending))